@@ -0,0 +1,220 @@
+"""
+Measures batch throughput against the local Kore API simulator (tools/kore_simulator.py).
+
+Run from the repository root, e.g.:
+
+    python benchmarks/bench_throughput.py --operation download_vzw --devices 200
+    python benchmarks/bench_throughput.py --operation terminate_vzw --mode routes --devices 200
+    python benchmarks/bench_throughput.py --operation swap_to_vzw --mode routes --devices 200
+
+The simulator is started in-process on a free port and the app is pointed at it through
+KORE_API_BASE_URL and KORE_TOKEN_URL. 'helpers' mode runs the per-EID workflows directly
+through utils.batch; 'routes' mode uploads a CSV to the main.py route and waits for the job.
+The result is printed as one JSON line, and appended to --output when given, so that runs
+before and after a change can be compared.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+from tools.kore_simulator import (create_app, device, SimulatorConfig, DEFAULT_LATENCY,
+                                  DEFAULT_SWITCH_SECONDS, DEFAULT_PROVISIONING_SECONDS)
+from utils.history import percentile
+
+
+VZW_PROFILE = 'cmp-prov-ap-12548'
+ATT_PROFILE = 'cmp-prov-ap-11052'
+
+OPERATIONS = {
+    'download_vzw': None,
+    'download_att': None,
+    'terminate_vzw': VZW_PROFILE,
+    'terminate_att': ATT_PROFILE,
+    'swap_to_vzw': ATT_PROFILE,
+    'swap_to_att': VZW_PROFILE,
+    'query_eid': None
+}
+
+
+def start_simulator(config):
+    """
+    Serves the simulator on a free local port in a background thread.
+
+    Returns:
+        tuple: The server, the simulator state and the base URL of the server.
+    """
+    app = create_app(config)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, app.config['SIMULATOR'], f"http://127.0.0.1:{server.server_port}"
+
+
+def csv_row(operation, index):
+    """
+    Builds the CSV row of a seeded device in the layout the main.py routes expect.
+    """
+    eid, imei, bs_iccid = device(index)
+    if operation == 'query_eid':
+        return [eid]
+    return ['', '', imei, '', eid, bs_iccid]
+
+
+def run_helpers(operation, devices, workers):
+    from utils.batch import iter_batch
+    from utils import workflows
+    from static.credentials import account_id
+
+    worker = getattr(workflows, f"{operation}_workflow")
+    items = []
+    for index in range(devices):
+        eid, imei, bs_iccid = device(index)
+        if operation.startswith(('download', 'swap')):
+            items.append((account_id, eid, imei, bs_iccid))
+        else:
+            items.append((account_id, eid))
+
+    rows = []
+    for messages, item_rows in iter_batch(items, worker, workflows.workflow_error, max_workers=workers):
+        rows.extend(item_rows)
+    return rows
+
+
+def run_routes(operation, devices, bulk):
+    """
+    Runs the main.py route of an operation in a temporary working directory, so that the uploads,
+    results, journals and operation history of the run stay out of the real ones.
+    """
+    import main
+    from utils.history import history, HISTORY_DB
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        history.path = os.path.join(workdir, HISTORY_DB)
+        try:
+            return _run_route(main.app, operation, devices, bulk)
+        finally:
+            os.chdir(cwd)
+
+
+def _run_route(app, operation, devices, bulk):
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['header'])
+    for index in range(devices):
+        writer.writerow(csv_row(operation, index))
+    data = {'csvFile': (io.BytesIO(buffer.getvalue().encode()), 'devices.csv')}
+    if bulk:
+        data['bulk'] = '1'
+    route = f"/{operation}"
+    if operation.startswith('swap'):
+        route = '/swap_carrier'
+        data['to_carrier'] = operation.rsplit('_', 1)[1]
+
+    client = app.test_client()
+    response = client.post(route, data=data, content_type='multipart/form-data')
+    job_id = response.get_data(as_text=True).split('streamJobEvents("', 1)[1].split('"', 1)[0]
+    while client.get(f"/jobs/{job_id}").get_json()['status'] in ('queued', 'running'):
+        time.sleep(0.5)
+
+    results = client.get(f"/jobs/{job_id}/results").get_data(as_text=True)
+    return list(csv.DictReader(io.StringIO(results)))
+
+
+def summarize(operation, mode, devices, elapsed, rows, stats):
+    statuses = {}
+    for row in rows:
+        status = str(row.get('status', row.get('state', ''))).lower()
+        statuses[status] = statuses.get(status, 0) + 1
+    switch_times = sorted(float(row['elapsed_time']) for row in rows
+                          if str(row.get('status', '')).lower() == 'completed' and row.get('elapsed_time'))
+    return {
+        'operation': operation,
+        'mode': mode,
+        'devices': devices,
+        'elapsed_seconds': round(elapsed, 3),
+        'devices_per_minute': round(devices / elapsed * 60, 2) if elapsed else None,
+        'api_calls': stats['total_calls'],
+        'api_calls_per_device': round(stats['total_calls'] / devices, 2) if devices else None,
+        'calls_by_endpoint': stats['calls'],
+        'throttled_calls': stats['throttled_calls'],
+        'statuses': statuses,
+        'p50_switch_seconds': percentile(switch_times, 50),
+        'p95_switch_seconds': percentile(switch_times, 95)
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks batch throughput against the Kore API simulator.")
+    parser.add_argument('--operation', choices=sorted(OPERATIONS), default='download_vzw')
+    parser.add_argument('--mode', choices=('helpers', 'routes'), default='helpers')
+    parser.add_argument('--bulk', action='store_true', help="Use multi-EID requests (routes mode).")
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8, help="Batch workers (helpers mode).")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--switch-seconds', type=float, default=DEFAULT_SWITCH_SECONDS)
+    parser.add_argument('--switch-failure-rate', type=float, default=0.0)
+    parser.add_argument('--provisioning-seconds', type=float, default=DEFAULT_PROVISIONING_SECONDS)
+    parser.add_argument('--provisioning-failure-rate', type=float, default=0.0)
+    parser.add_argument('--webhooks', action='store_true',
+                        help="Serve the app's webhook routes and have the simulator notify completions.")
+    parser.add_argument('--quota', type=float, help="Simulated API calls per second before 429s.")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Appends the result as a JSON line to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = SimulatorConfig(devices=args.devices, latency=args.latency, error_rate=args.error_rate,
+                             switch_seconds=args.switch_seconds, switch_failure_rate=args.switch_failure_rate,
+                             provisioning_seconds=args.provisioning_seconds,
+                             provisioning_failure_rate=args.provisioning_failure_rate,
+                             quota=args.quota, preload=OPERATIONS[args.operation], seed=args.seed)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server, state, base_url = start_simulator(config)
+    os.environ['KORE_API_BASE_URL'] = f"{base_url}/connectivity/v1"
+    os.environ['KORE_TOKEN_URL'] = f"{base_url}/Api/api/token"
+    app_server = None
+    if args.webhooks:
+        os.environ['KORE_WEBHOOKS_ENABLED'] = '1'
+        os.environ['KORE_WEBHOOK_SECRET'] = state.config.webhook_secret = uuid.uuid4().hex
+        import main as app_main
+        app_server = make_server('127.0.0.1', 0, app_main.app, threaded=True)
+        threading.Thread(target=app_server.serve_forever, daemon=True).start()
+        state.config.webhook_url = f"http://127.0.0.1:{app_server.server_port}/webhooks"
+
+    start_time = time.time()
+    try:
+        if args.mode == 'helpers':
+            rows = run_helpers(args.operation, args.devices, args.workers)
+        else:
+            rows = run_routes(args.operation, args.devices, args.bulk)
+        elapsed = time.time() - start_time
+    finally:
+        server.shutdown()
+        if app_server is not None:
+            app_server.shutdown()
+
+    result = summarize(args.operation, args.mode, args.devices, elapsed, rows, state.stats())
+    print(json.dumps(result))
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Runs download, terminate, swap and query batches from a CSV file without the web app.
+
+The CSV file has the layout of the matching main.py route. Run from the repository root, e.g.:
+
+    python cli.py download_vzw devices.csv --output results.csv
+    python cli.py terminate_att devices.csv --processes 4 --bulk
+
+With --processes N the data rows are split into N contiguous shards, each run by its own process
+with its own worker pool and results file, and the shard files are concatenated into --output in
+shard order, so the merged file keeps the order of the rows. Every process gets 1/N of the rate
+limits of utils.rate_limit, so the campaign as a whole stays within them.
+
+Every shard keeps a journal of the stage of each EID (see utils.journal). If the run dies, rerun
+it with the same arguments plus --resume JOB_ID: finished EIDs are skipped and the switch and
+provisioning requests already submitted are waited for instead of submitted again.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import shutil
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from static.credentials import account_id
+from utils.batch import iter_batch_items, BATCH_WORKERS
+from utils.csv_files import count_csv_rows, iter_csv_rows
+from utils.history import history
+from utils.inventory import SubscriptionInventory
+from utils.journal import Journal, journal_path
+from utils.operations import (SWITCH_FIELDS, QUERY_FIELDS, SWAP_FIELDS, download_item, download_devices,
+                              terminate_item, query_item)
+from utils.post_functions import VZW_ACTIVATION_PROFILE, ATT_ACTIVATION_PROFILE
+from utils.rate_limit import rate_limiter, RATE_LIMITS
+from utils.results import ResultsWriter
+from utils.workflows import (download_vzw_workflow,
+                             download_att_workflow,
+                             bulk_download_workflow,
+                             bulk_terminate_workflow,
+                             terminate_vzw_workflow,
+                             terminate_att_workflow,
+                             swap_to_vzw_workflow,
+                             swap_to_att_workflow,
+                             query_eid_workflow,
+                             workflow_error)
+
+
+DEFAULT_OUTPUT = 'results.csv'
+
+
+OPERATIONS = {
+    'download_vzw': (download_vzw_workflow, download_item, SWITCH_FIELDS),
+    'download_att': (download_att_workflow, download_item, SWITCH_FIELDS),
+    'terminate_vzw': (terminate_vzw_workflow, terminate_item, SWITCH_FIELDS),
+    'terminate_att': (terminate_att_workflow, terminate_item, SWITCH_FIELDS),
+    'swap_to_vzw': (swap_to_vzw_workflow, download_item, SWAP_FIELDS),
+    'swap_to_att': (swap_to_att_workflow, download_item, SWAP_FIELDS),
+    'query_eid': (query_eid_workflow, query_item, QUERY_FIELDS)
+}
+
+JOURNALED_OPERATIONS = ('download_vzw', 'download_att', 'terminate_vzw', 'terminate_att', 'swap_to_vzw', 'swap_to_att')
+
+BULK_OPERATIONS = {
+    'download_vzw': lambda rows, inventory: bulk_download_workflow(
+        account_id, download_devices(VZW_ACTIVATION_PROFILE, rows), inventory=inventory),
+    'download_att': lambda rows, inventory: bulk_download_workflow(
+        account_id, download_devices(ATT_ACTIVATION_PROFILE, rows), inventory=inventory),
+    'terminate_vzw': lambda rows, inventory: bulk_terminate_workflow(
+        account_id, 'vzw', [row[4] for row in rows], inventory=inventory),
+    'terminate_att': lambda rows, inventory: bulk_terminate_workflow(
+        account_id, 'att', [row[4] for row in rows], inventory=inventory)
+}
+
+
+def shard_bounds(total, shards):
+    """
+    Splits the data rows into contiguous shards of nearly equal size.
+
+    Args:
+        total (int): The number of data rows.
+        shards (int): The number of shards.
+
+    Returns:
+        list[tuple[int, int]]: The (start, end) row indexes of each non-empty shard.
+    """
+    size, extra = divmod(total, shards)
+    bounds = []
+    start = 0
+    for index in range(shards):
+        end = start + size + (1 if index < extra else 0)
+        if end > start:
+            bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def shard_path(output, index):
+    """
+    Returns:
+        str: The path of the results file of a shard, next to the merged results file.
+    """
+    root, ext = os.path.splitext(output)
+    return f"{root}.shard{index}{ext or '.csv'}"
+
+
+def share_rate_limits(shards):
+    """
+    Gives this process 1/shards of every rate limit, for a campaign split across processes.
+
+    Args:
+        shards (int): The number of processes sharing the limits.
+    """
+    for endpoint_class, (rate, burst) in RATE_LIMITS.items():
+        rate_limiter.configure(endpoint_class, rate / shards, max(burst // shards, 1))
+
+
+def shard_journal_path(job_id, index):
+    """
+    Returns:
+        str: The path of the journal of a shard.
+    """
+    return journal_path(f"{job_id}.shard{index}")
+
+
+def run_shard(operation, csv_path, start, end, path, job_id, index=0, shards=1, workers=BATCH_WORKERS,
+              bulk=False, use_inventory=False, resume=False):
+    """
+    Runs an operation over rows [start, end) of a CSV file and writes their results to path.
+
+    The results.csv rows of every EID are also recorded in the operation history under job_id,
+    and the result messages are printed as each EID finishes. Unless bulk is set, the stage of
+    every EID is journaled (for query_eid, only whether it finished), and a resumed shard appends
+    to its results file and skips the EIDs the journal records as finished.
+
+    Args:
+        operation (str): A key of OPERATIONS.
+        csv_path (str): The path of the CSV file.
+        start (int): The index of the first data row of the shard.
+        end (int): The index after the last data row of the shard.
+        path (str): The path of the results file of the shard.
+        job_id (str): The ID the results are recorded under in the operation history.
+        index (int): The index of the shard.
+        shards (int): The number of processes sharing the rate limits.
+        workers (int): The maximum number of EIDs processed at the same time.
+        bulk (bool): Whether to use the multi-EID requests of BULK_OPERATIONS.
+        use_inventory (bool): Whether to serve the subscription lookups from an inventory.
+        resume (bool): Whether to resume the shard of an earlier run of job_id.
+
+    Returns:
+        dict[str, int]: The number of results.csv rows by status, for the EIDs run this time.
+    """
+    if shards > 1:
+        share_rate_limits(shards)
+    worker, make_item, fieldnames = OPERATIONS[operation]
+    inventory = SubscriptionInventory(account_id) if use_inventory else None
+    csv_rows = itertools.islice(iter_csv_rows(csv_path), start, end)
+    statuses = {}
+    journal_file = shard_journal_path(job_id, index)
+    if not resume:
+        for stale in (path, journal_file):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+    with ResultsWriter(path, fieldnames) as writer:
+        if bulk:
+            csv_rows = list(csv_rows)
+            results = ((None, result, False) for result in BULK_OPERATIONS[operation](csv_rows, inventory))
+            journal = None
+        else:
+            journal = Journal(journal_file)
+            journal.start(operation=operation, csv_path=csv_path, start=start, end=end)
+            finished = journal.finished_eids()
+            items = (make_item(row) for row in csv_rows if make_item(row)[1] not in finished)
+            if operation in JOURNALED_OPERATIONS:
+                worker = partial(worker, inventory=inventory, journal=journal)
+            else:
+                worker = partial(worker, inventory=inventory)
+            results = iter_batch_items(items, worker, workflow_error, max_workers=workers)
+
+        try:
+            for item, (messages, rows), raised in results:
+                for message in messages:
+                    print(message, flush=True)
+                writer.write(rows)
+                history.record(job_id, operation, rows)
+                if journal is not None and not raised:
+                    journal.finish(item[1], rows)
+                for row in rows:
+                    status = str(row.get('status', row.get('state', '')))
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            if journal is not None:
+                journal.close()
+
+    return statuses
+
+
+def check_resume(job_id, operation, bounds):
+    """
+    Checks that an earlier run of job_id left a journal for every shard, covering the same rows.
+
+    Args:
+        job_id (str): The ID of the run to resume.
+        operation (str): The operation of this run.
+        bounds (list[tuple[int, int]]): The (start, end) rows of each shard of this run.
+
+    Returns:
+        str or None: Why the run cannot be resumed, or None if it can.
+    """
+    for index, (start, end) in enumerate(bounds):
+        path = shard_journal_path(job_id, index)
+        if not os.path.exists(path):
+            return f"no journal for shard {index} of job {job_id}"
+        with Journal(path) as journal:
+            meta = journal.meta or {}
+        if (meta.get('operation'), meta.get('start'), meta.get('end')) != (operation, start, end):
+            return f"shard {index} of job {job_id} ran other rows or another operation, use the same arguments"
+    return None
+
+
+def merge_results(paths, output):
+    """
+    Concatenates the shard results files into one results file and deletes them.
+
+    Args:
+        paths (list[str]): The shard results files, in shard order. All have the same header.
+        output (str): The path of the merged results file.
+    """
+    with open(output, 'w', newline='') as merged:
+        if not paths:
+            return
+        for index, path in enumerate(paths):
+            with open(path, newline='') as shard:
+                header = shard.readline()
+                if index == 0:
+                    merged.write(header)
+                shutil.copyfileobj(shard, merged)
+    for path in paths:
+        os.remove(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Runs a profile switch batch from a CSV file.")
+    parser.add_argument('operation', choices=sorted(OPERATIONS))
+    parser.add_argument('csv_path', help="CSV file laid out as for the matching main.py route.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Merged results file.")
+    parser.add_argument('--processes', type=int, default=1, help="Number of shard processes.")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="EIDs processed at once per process.")
+    parser.add_argument('--bulk', action='store_true', help="Use multi-EID requests (download and terminate).")
+    parser.add_argument('--inventory', action='store_true', help="Serve subscription lookups from an inventory.")
+    parser.add_argument('--resume', metavar='JOB_ID', help="Resume an earlier run that did not finish.")
+    args = parser.parse_args(argv)
+    if args.bulk and args.operation not in BULK_OPERATIONS:
+        parser.error(f"--bulk is not supported for {args.operation}")
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.resume and args.bulk:
+        parser.error("--resume is not supported with --bulk")
+    return args
+
+
+def main(argv=None):
+    """
+    Runs the command line entry point.
+
+    Returns:
+        int: The exit status, 1 if a shard failed.
+    """
+    args = parse_args(argv)
+    job_id = args.resume or uuid.uuid4().hex
+    bounds = shard_bounds(count_csv_rows(args.csv_path), args.processes)
+    if args.resume:
+        error = check_resume(job_id, args.operation, bounds)
+        if error is not None:
+            print(f"Error: {error}")
+            return 2
+    paths = [shard_path(args.output, index) for index in range(len(bounds))]
+    shard_args = [(args.operation, args.csv_path, start, end, path, job_id, index, len(bounds), args.workers,
+                   args.bulk, args.inventory, bool(args.resume))
+                  for index, ((start, end), path) in enumerate(zip(bounds, paths))]
+
+    totals = {}
+    failed = False
+    if len(shard_args) <= 1:
+        results = [run_shard(*shard) for shard in shard_args]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(shard_args), mp_context=context) as executor:
+            futures = [executor.submit(run_shard, *shard) for shard in shard_args]
+            results = []
+            for index, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Error: shard {index} failed: {str(e)}")
+                    failed = True
+
+    if failed:
+        print(f"Shard results kept in {', '.join(path for path in paths if os.path.exists(path))}. "
+              f"Resume with --resume {job_id}")
+        return 1
+
+    merge_results(paths, args.output)
+    for index in range(len(bounds)):
+        if os.path.exists(shard_journal_path(job_id, index)):
+            os.remove(shard_journal_path(job_id, index))
+
+    for statuses in results:
+        for status, count in statuses.items():
+            totals[status] = totals.get(status, 0) + count
+    print(f"Job {job_id}: {totals}. Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,24 +1,225 @@
-import time
-import csv
-from flask import Flask, render_template, request, send_file
-from utils.init import compare_values
-from static.credentials import account_id
-from utils.get_functions import (get_iccid_with_active_state,
-                                 check_request_status,
-                                 check_verizon,
-                                 check_provisioning_request_status,
-                                 check_att,
-                                 get_eid_information)
-from utils.post_functions import (download_vzw_profile,
-                                  force_retry_switch_request,
-                                  terminate_profile,
-                                  download_att_profile)
+import hmac
+import json
+import os
+import re
+from functools import partial
+from flask import Flask, render_template, request, send_file, jsonify, abort, Response, redirect, url_for
+from static.credentials import account_id, webhook_secret
+from utils.batch import iter_batch, iter_batch_items
+from utils.csv_files import save_upload, count_csv_rows, iter_csv_rows
+from utils.inventory import SubscriptionInventory
+from utils.jobs import jobs
+from utils.journal import Journal, journal_path
+from utils.history import history
+from utils.metrics import metrics
+from utils.notifications import notifications
+from utils.operations import (SWITCH_FIELDS, QUERY_FIELDS, SWAP_FIELDS, download_item, download_devices,
+                              terminate_item, query_item)
+from utils.results import ResultsWriter, results_path
+from utils.post_functions import VZW_ACTIVATION_PROFILE, ATT_ACTIVATION_PROFILE
+from utils.workflows import (download_vzw_workflow,
+                             download_att_workflow,
+                             bulk_download_workflow,
+                             bulk_terminate_workflow,
+                             terminate_vzw_workflow,
+                             terminate_att_workflow,
+                             swap_to_vzw_workflow,
+                             swap_to_att_workflow,
+                             query_eid_workflow,
+                             workflow_error,
+                             ErrorResult)
 
 
 app = Flask(__name__, template_folder='templates')
 
-Results = []
-results_csv = []
+SWAP_WORKFLOWS = {
+    'vzw': swap_to_vzw_workflow,
+    'att': swap_to_att_workflow
+}
+
+
+JOURNALED_JOBS = {
+    'download_vzw': (download_item, download_vzw_workflow, SWITCH_FIELDS),
+    'download_att': (download_item, download_att_workflow, SWITCH_FIELDS),
+    'terminate_vzw': (terminate_item, terminate_vzw_workflow, SWITCH_FIELDS),
+    'terminate_att': (terminate_item, terminate_att_workflow, SWITCH_FIELDS),
+    'swap_to_vzw': (download_item, swap_to_vzw_workflow, SWAP_FIELDS),
+    'swap_to_att': (download_item, swap_to_att_workflow, SWAP_FIELDS)
+}
+
+
+def store_results(job, writer, rows):
+    """
+    Appends the results.csv rows of one EID to the job's results file and the operation history.
+
+    Args:
+        job (Job): The job that produced the rows.
+        writer (ResultsWriter): The writer of the job's results file.
+        rows (list[dict]): The results.csv rows of the EID.
+    """
+    writer.write(rows)
+    history.record(job.id, job.name, rows)
+
+
+def upload_inventory():
+    """
+    Returns a subscription inventory for an uploaded CSV file if the 'inventory' form field is set.
+
+    The inventory pages through all subscriptions of the account once, on first use, and serves
+    the subscription lookups of every row from memory (see utils.inventory).
+
+    Returns:
+        SubscriptionInventory or None: A new inventory, or None to look up each EID with the API.
+    """
+    if request.form.get('inventory'):
+        return SubscriptionInventory(account_id)
+    return None
+
+
+def run_single_job(name, item, worker, fieldnames):
+    """
+    Runs a per-EID workflow for a single form submission as a job of its own.
+
+    The workflow runs on the request thread. Its messages are returned for rendering and its
+    results.csv rows are written to the job's results file (see /jobs/<job_id>/results), so
+    concurrent submissions never share results.
+
+    Args:
+        name (str): The operation of the job, e.g. 'download_vzw'.
+        item (tuple): The workflow arguments, starting with (account_id, eid, ...).
+        worker (callable): The per-EID workflow.
+        fieldnames (list[str]): The column names of results.csv.
+
+    Returns:
+        tuple[Job, list[str]]: The finished job and the result messages of the EID.
+    """
+    messages = []
+
+    def run(job):
+        with ResultsWriter(results_path(job.id), fieldnames) as writer:
+            try:
+                item_messages, rows = job.track(worker)(*item)
+            except Exception as e:
+                item_messages, rows = workflow_error(item, e)
+            messages.extend(item_messages)
+            store_results(job, writer, rows)
+
+    job = jobs.run(name, 1, run)
+    return job, messages
+
+
+def submit_batch_job(name, path, make_item, worker, fieldnames):
+    """
+    Queues an uploaded CSV file as a background job that runs a per-EID workflow over every row.
+
+    The job parses the file row by row and dispatches each row to the worker pool as soon as it
+    is read (see utils.batch.iter_batch), while a second pass counts the rows so that its progress
+    reports the number of pending EIDs once they are counted. The results.csv rows of each row are
+    appended to the job's results file as soon as they are known, in the order of the rows (see
+    utils.results.ResultsWriter). The uploaded file is deleted when the job ends.
+
+    Args:
+        name (str): The operation of the job, e.g. 'download_vzw'.
+        path (str): The path of the saved CSV file (see utils.csv_files.save_upload).
+        make_item (callable): Builds the workflow arguments from a CSV row.
+        worker (callable): The per-EID workflow.
+        fieldnames (list[str]): The column names of results.csv.
+
+    Returns:
+        Job: The queued job.
+    """
+    def run(job):
+        counting = job.start_count(lambda: count_csv_rows(path))
+        try:
+            with ResultsWriter(results_path(job.id), fieldnames) as writer:
+                items = (make_item(row) for row in iter_csv_rows(path))
+                for messages, rows in iter_batch(items, job.track(worker), workflow_error):
+                    store_results(job, writer, rows)
+        finally:
+            counting.join()
+            os.remove(path)
+    return jobs.submit(name, None, run)
+
+
+def submit_journaled_job(name, path, use_inventory, job_id=None):
+    """
+    Queues an uploaded CSV file as a background job like submit_batch_job, keeping a journal of
+    the stage of every EID (see utils.journal).
+
+    The journal and the uploaded file are kept until the job finishes, so that a job cut short
+    by a crash or restart can be resumed with /jobs/<job_id>/resume: the resumed job appends to
+    the same results file, skips the EIDs whose results were already written and re-attaches to
+    the switch and provisioning requests already submitted. An EID whose workflow raised, e.g.
+    while the API was unavailable, is not marked finished and is retried on resume.
+
+    Args:
+        name (str): The operation of the job, a key of JOURNALED_JOBS.
+        path (str): The path of the saved CSV file (see utils.csv_files.save_upload).
+        use_inventory (bool): Whether to serve the subscription lookups from an inventory.
+        job_id (str, optional): The ID of the job to resume.
+
+    Returns:
+        Job or None: The queued job, or None if the job being resumed is still queued or running.
+    """
+    make_item, workflow, fieldnames = JOURNALED_JOBS[name]
+
+    def run(job):
+        inventory = SubscriptionInventory(account_id) if use_inventory else None
+        with Journal(journal_path(job.id)) as journal:
+            journal.start(name=name, csv_path=path, inventory=use_inventory)
+            worker = job.track(partial(workflow, inventory=inventory, journal=journal))
+            finished = journal.finished_eids()
+            counting = job.start_count(lambda: sum(1 for row in iter_csv_rows(path) if make_item(row)[1] not in finished))
+            csv_rows = (row for row in iter_csv_rows(path) if make_item(row)[1] not in finished)
+            items = (make_item(row) for row in csv_rows)
+
+            try:
+                with ResultsWriter(results_path(job.id), fieldnames) as writer:
+                    for item, (messages, rows), raised in iter_batch_items(items, worker, workflow_error):
+                        store_results(job, writer, rows)
+                        if not raised:
+                            journal.finish(item[1], rows)
+            finally:
+                counting.join()
+        os.remove(path)
+        os.remove(journal_path(job.id))
+    return jobs.submit(name, None, run, job_id)
+
+
+def submit_bulk_job(name, path, eid_column, bulk, fieldnames):
+    """
+    Queues an uploaded CSV file as a background job that runs a bulk workflow over all rows.
+
+    Bulk workflows group the EIDs into multi-EID requests, so the rows are read into memory
+    before the workflow starts. The result of each row is recorded, published and written to
+    the job's results file as soon as it is known, i.e. once the poll of its chunk finishes, so
+    the results file is in the order the chunks finish rather than in the order of the rows.
+
+    Args:
+        name (str): The operation of the job, e.g. 'download_vzw'.
+        path (str): The path of the saved CSV file (see utils.csv_files.save_upload).
+        eid_column (int): The position of the EID in a CSV row.
+        bulk (callable): Called as bulk(csv_rows, on_result) with the list of CSV rows. It calls
+                         on_result(index, result) with the (messages, rows) of each row as soon as
+                         it is known. A row whose check or chunk raised, passed as an ErrorResult,
+                         counts as failed.
+        fieldnames (list[str]): The column names of results.csv.
+
+    Returns:
+        Job: The queued job.
+    """
+    def run(job):
+        try:
+            csv_rows = list(job.count(iter_csv_rows(path)))
+        finally:
+            os.remove(path)
+        with ResultsWriter(results_path(job.id), fieldnames) as writer:
+            def publish(index, result):
+                messages, rows = result
+                job.record(csv_rows[index][eid_column], messages, rows, failed=isinstance(result, ErrorResult))
+                store_results(job, writer, rows)
+            bulk(csv_rows, publish)
+    return jobs.submit(name, 0, run)
 
 
 @app.route('/')
@@ -32,7 +233,6 @@ def home():
         render_template: A Flask response object that contains the
                          rendered template string of 'index.html'.
     """
-    global results_csv
     return render_template('index.html')
 
 
@@ -94,6 +294,19 @@ def terminate_att_page():
     return render_template('terminate_att.html', csvFileUploaded=csvFileUploaded)
 
 
+@app.route('/swap_carrier_page')
+def swap_carrier_page():
+    """
+    Handles the routing to the 'swap_carrier' page. Checks if a CSV file was uploaded,
+    and renders the template accordingly.
+
+    Returns:
+        render_template: Rendered HTML template 'swap_carrier.html' with 'csvFileUploaded' variable.
+    """
+    csvFileUploaded = 'csvFile' in request.files and request.files['csvFile'].filename != ''
+    return render_template('swap_carrier.html', csvFileUploaded=csvFileUploaded)
+
+
 @app.route('/download_vzw', methods=['POST'])
 def download_vzw_profile_main():
     """Process the download profile request.
@@ -102,7 +315,12 @@ def download_vzw_profile_main():
     It accepts either a file upload containing CSV data or form data.
     It processes each row in the CSV or the form data, checking the
     active ICCID against the provided bootstrap ICCID and initiates a
-    profile download if they match.
+    profile download if they match. A CSV upload is queued as a
+    background job (see /jobs/<job_id>) whose rows are processed
+    concurrently by a bounded pool of workers; results.csv keeps the
+    order of the rows.
+    If the 'bulk' form field is set, the CSV rows are downloaded with
+    multi-EID download requests (see bulk_download_workflow).
 
     In case of a CSV file, it's expected to contain columns with the
     names 'eid', 'imei', and 'bs_iccid' in the 4th, 2nd, and 5th
@@ -120,102 +338,30 @@ def download_vzw_profile_main():
         results.csv: A button will be displayed to download the results
                      of the profile switching as a csv.
     """
-    global results_csv
-    results_csv.clear()
-    Results.clear()
     if 'csvFile' in request.files:
         csv_file = request.files['csvFile']
         if csv_file.filename.endswith('.csv'):
-            csv_data = csv_file.read().decode('utf-8')
-            reader = csv.reader(csv_data.splitlines())
-            next(reader)
-            for row in reader:
-                eid = row[4]
-                imei = row[2]
-                bs_iccid = row[5]
-
-                active_iccid = get_iccid_with_active_state(account_id, eid)
-                is_bootstrap = compare_values(active_iccid, bs_iccid)
-                has_verizon, subscription_id = check_verizon(account_id, eid)
-
-                if is_bootstrap and not has_verizon:
-                    start_time = time.time()
-                    request_id = download_vzw_profile(account_id, eid, imei)
-                    time.sleep(1)
-                    force_retry_switch_request(account_id, request_id, eid)
-                    status = check_request_status(account_id, request_id)
-                    while status.lower() != "completed":
-                        time.sleep(1)
-                        status = check_request_status(account_id, request_id)
-                        if status.lower() == "failed":
-                            Results.append(f"Profile download for EID: {eid} has failed.")
-                            break
-                    Results.append(f"Profile downloaded for EID: {eid}")
-                    end_time = time.time()
-                    elapsed_time = end_time - start_time
-                    Results.append(f"Elapsed Time: {elapsed_time} seconds")
-                    results_csv.append({
-                        'request_id': request_id,
-                        'status': status,
-                        'elapsed_time': elapsed_time
-                    })
-                else:
-                    if has_verizon:
-                        Results.append(f"EID {eid} has a Verizon profile in the Ready state. "
-                                       f"Terminate the profile and try again.")
-                    if not is_bootstrap:
-                        Results.append(f"EID {eid} does not match the provided Bootstrap ICCID.")
-
-            with open('results.csv', 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-                writer.writeheader()
-                writer.writerows(results_csv)
-
-            return render_template('download_vzw.html', Results=Results)
+            path = save_upload(csv_file)
+            if request.form.get('bulk'):
+                inventory = upload_inventory()
+                job = submit_bulk_job('download_vzw', path, 4,
+                                      lambda rows, on_result: bulk_download_workflow(account_id, download_devices(VZW_ACTIVATION_PROFILE, rows),
+                                                                                     inventory=inventory, on_result=on_result),
+                                      SWITCH_FIELDS)
+            else:
+                job = submit_journaled_job('download_vzw', path, bool(request.form.get('inventory')))
+
+            return render_template('download_vzw.html', job_id=job.id)
 
     eid = request.form['eid']
     imei = request.form['imei']
     bs_iccid = request.form['bs_iccid']
 
-    active_iccid = get_iccid_with_active_state(account_id, eid)
-    is_bootstrap = compare_values(active_iccid, bs_iccid)
-    has_verizon, subscription_id = check_verizon(account_id, eid)
-
-    if is_bootstrap and not has_verizon:
-        start_time = time.time()
-        request_id = download_vzw_profile(account_id, eid, imei)
-        time.sleep(1)
-        force_retry_switch_request(account_id,request_id,eid)
-        status = check_request_status(account_id, request_id)
-        while status.lower() != "completed":
-            time.sleep(1)
-            status = check_request_status(account_id, request_id)
-
-            if status.lower() == "failed":
-                Results.append(f"Profile download for EID: {eid} has failed.")
-                break
-        Results.append(f"Profile downloaded for EID: {eid}")
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        Results.append(f"Elapsed Time: {elapsed_time} seconds")
-        results_csv.append({
-            'request_id': request_id,
-            'status': status,
-            'elapsed_time': elapsed_time
-        })
-    else:
-        if has_verizon:
-            Results.append(f"EID {eid} has a Verizon profile in the Ready state. "
-                           f"Terminate the profile and try again.")
-        if not is_bootstrap:
-            Results.append(f"EID {eid} does not match the provided Bootstrap ICCID.")
-
-    with open('results.csv', 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-        writer.writeheader()
-        writer.writerows(results_csv)
-
-    return render_template('download_vzw.html', Results=Results)
+    job, messages = run_single_job('download_vzw', (account_id, eid, imei, bs_iccid),
+                                   download_vzw_workflow, SWITCH_FIELDS)
+
+    return render_template('download_vzw.html', Results=messages,
+                           results_url=url_for('job_results', job_id=job.id))
 
 
 @app.route('/download_att', methods=['POST'])
@@ -226,7 +372,12 @@ def download_att_profile_main():
     It accepts either a file upload containing CSV data or form data.
     It processes each row in the CSV or the form data, checking the
     active ICCID against the provided bootstrap ICCID and initiates a
-    profile download if they match.
+    profile download if they match. A CSV upload is queued as a
+    background job (see /jobs/<job_id>) whose rows are processed
+    concurrently by a bounded pool of workers; results.csv keeps the
+    order of the rows.
+    If the 'bulk' form field is set, the CSV rows are downloaded with
+    multi-EID download requests (see bulk_download_workflow).
 
     In case of a CSV file, it's expected to contain columns with the
     names 'eid', 'imei', and 'bs_iccid' in the 4th, 2nd, and 5th
@@ -244,102 +395,30 @@ def download_att_profile_main():
         results.csv: A button will be displayed to download the results
                      of the profile switching as a csv.
     """
-    global results_csv
-    results_csv.clear()
-    Results.clear()
     if 'csvFile' in request.files:
         csv_file = request.files['csvFile']
         if csv_file.filename.endswith('.csv'):
-            csv_data = csv_file.read().decode('utf-8')
-            reader = csv.reader(csv_data.splitlines())
-            next(reader)
-            for row in reader:
-                eid = row[4]
-                imei = row[2]
-                bs_iccid = row[5]
-
-                active_iccid = get_iccid_with_active_state(account_id, eid)
-                is_bootstrap = compare_values(active_iccid, bs_iccid)
-                has_att, subscription_id = check_att(account_id, eid)
-
-                if is_bootstrap and not has_att:
-                    start_time = time.time()
-                    request_id = download_att_profile(account_id, eid)
-                    time.sleep(1)
-                    force_retry_switch_request(account_id, request_id, eid)
-                    status = check_request_status(account_id, request_id)
-                    while status.lower() != "completed":
-                        time.sleep(1)
-                        status = check_request_status(account_id, request_id)
-                        if status.lower() == "failed":
-                            Results.append(f"Profile download for EID: {eid} has failed.")
-                            break
-                    Results.append(f"Profile downloaded for EID: {eid}")
-                    end_time = time.time()
-                    elapsed_time = end_time - start_time
-                    Results.append(f"Elapsed Time: {elapsed_time} seconds")
-                    results_csv.append({
-                        'request_id': request_id,
-                        'status': status,
-                        'elapsed_time': elapsed_time
-                    })
-                else:
-                    if has_att:
-                        Results.append(f"EID {eid} has an ATT profile in the Ready state. "
-                                       f"Terminate the profile and try again.")
-                    if not is_bootstrap:
-                        Results.append(f"EID {eid} does not match the provided Bootstrap ICCID.")
-
-            with open('results.csv', 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-                writer.writeheader()
-                writer.writerows(results_csv)
-
-            return render_template('download_att.html', Results=Results)
+            path = save_upload(csv_file)
+            if request.form.get('bulk'):
+                inventory = upload_inventory()
+                job = submit_bulk_job('download_att', path, 4,
+                                      lambda rows, on_result: bulk_download_workflow(account_id, download_devices(ATT_ACTIVATION_PROFILE, rows),
+                                                                                     inventory=inventory, on_result=on_result),
+                                      SWITCH_FIELDS)
+            else:
+                job = submit_journaled_job('download_att', path, bool(request.form.get('inventory')))
+
+            return render_template('download_att.html', job_id=job.id)
 
     eid = request.form['eid']
     imei = request.form['imei']
     bs_iccid = request.form['bs_iccid']
 
-    active_iccid = get_iccid_with_active_state(account_id, eid)
-    is_bootstrap = compare_values(active_iccid, bs_iccid)
-    has_att, subscription_id = check_att(account_id, eid)
-
-    if is_bootstrap and not has_att:
-        start_time = time.time()
-        request_id = download_att_profile(account_id, eid)
-        time.sleep(1)
-        force_retry_switch_request(account_id,request_id,eid)
-        status = check_request_status(account_id, request_id)
-        while status.lower() != "completed":
-            time.sleep(1)
-            status = check_request_status(account_id, request_id)
-
-            if status.lower() == "failed":
-                Results.append(f"Profile download for EID: {eid} has failed.")
-                break
-        Results.append(f"Profile downloaded for EID: {eid}")
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        Results.append(f"Elapsed Time: {elapsed_time} seconds")
-        results_csv.append({
-            'request_id': request_id,
-            'status': status,
-            'elapsed_time': elapsed_time
-        })
-    else:
-        if has_att:
-            Results.append(f"EID {eid} has an ATT profile in the Ready state. "
-                           f"Terminate the profile and try again.")
-        if not is_bootstrap:
-            Results.append(f"EID {eid} does not match the provided Bootstrap ICCID.")
-
-    with open('results.csv', 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-        writer.writeheader()
-        writer.writerows(results_csv)
-
-    return render_template('download_att.html', Results=Results)
+    job, messages = run_single_job('download_att', (account_id, eid, imei, bs_iccid),
+                                   download_att_workflow, SWITCH_FIELDS)
+
+    return render_template('download_att.html', Results=messages,
+                           results_url=url_for('job_results', job_id=job.id))
 
 
 @app.route('/terminate_vzw', methods=['POST'])
@@ -351,6 +430,11 @@ def terminate_vzw_profile():
     It accepts either a file upload containing CSV data or form data.
     It processes each row in the CSV or the form data, checking the
     Verizon profile status and initiates a profile termination if it's present.
+    A CSV upload is queued as a background job (see /jobs/<job_id>) whose
+    rows are processed concurrently by a bounded pool of workers;
+    results.csv keeps the order of the rows. If the 'bulk' form field is set,
+    the Ready profiles are terminated with multi-subscription provisioning
+    requests (see bulk_terminate_workflow).
 
     In case of a CSV file, it's expected to contain a column with the
     name 'eid' in the 4th position (0-indexed).
@@ -363,88 +447,32 @@ def terminate_vzw_profile():
                          along with the results of the profile
                          termination attempts.
 
-        results.csv: A CSV file will be created in the root directory
+        results.csv: A CSV file will be created for the job
                      containing the results of the profile termination.
-                     It contains the request_id, status, and elapsed_time
+                     It contains the eid, request_id, status, and elapsed_time
                      for each termination attempt.
     """
-    global results_csv
-    results_csv.clear()
-    Results.clear()
     if 'csvFile' in request.files:
         csv_file = request.files['csvFile']
         if csv_file.filename.endswith('.csv'):
-            csv_data = csv_file.read().decode('utf-8')
-            reader = csv.reader(csv_data.splitlines())
-            next(reader)
-            for row in reader:
-                eid = row[4]
-
-                has_verizon, subscription_id = check_verizon(account_id, eid)
-
-                if has_verizon:
-                    start_time = time.time()
-                    provisioning_request_id = terminate_profile(account_id, subscription_id)
-                    time.sleep(1)
-                    status = check_provisioning_request_status(account_id, provisioning_request_id)
-                    while status.lower() != "completed":
-                        time.sleep(1)
-                        status = check_provisioning_request_status(account_id, provisioning_request_id)
-                        if status.lower() == "failed":
-                            Results.append(f"Profile terminate for EID: {eid} has failed.")
-                            break
-                    Results.append(f"Profile terminated for EID: {eid}")
-                    end_time = time.time()
-                    elapsed_time = end_time - start_time
-                    Results.append(f"Elapsed Time: {elapsed_time} seconds")
-                    results_csv.append({
-                        'request_id': provisioning_request_id,
-                        'status': status,
-                        'elapsed_time': elapsed_time
-                    })
-                else:
-                    Results.append(f"EID {eid} does not have a Verizon profile in the Ready state present.")
-
-            with open('results.csv', 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-                writer.writeheader()
-                writer.writerows(results_csv)
-
-            return render_template('terminate_vzw.html', Results=Results)
+            path = save_upload(csv_file)
+            if request.form.get('bulk'):
+                inventory = upload_inventory()
+                job = submit_bulk_job('terminate_vzw', path, 4,
+                                      lambda rows, on_result: bulk_terminate_workflow(account_id, 'vzw', [row[4] for row in rows],
+                                                                                      inventory=inventory, on_result=on_result),
+                                      SWITCH_FIELDS)
+            else:
+                job = submit_journaled_job('terminate_vzw', path, bool(request.form.get('inventory')))
+
+            return render_template('terminate_vzw.html', job_id=job.id)
 
     eid = request.form['eid']
 
-    has_verizon, subscription_id = check_verizon(account_id, eid)
-
-    if has_verizon:
-        start_time = time.time()
-        provisioning_request_id = terminate_profile(account_id, subscription_id)
-        time.sleep(1)
-        status = check_provisioning_request_status(account_id, provisioning_request_id)
-        while status.lower() != "completed":
-            time.sleep(1)
-            status = check_provisioning_request_status(account_id, provisioning_request_id)
-            if status.lower() == "failed":
-                Results.append(f"Profile terminate for EID: {eid} has failed.")
-                break
-        Results.append(f"Profile terminated for EID: {eid}")
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        Results.append(f"Elapsed Time: {elapsed_time} seconds")
-        results_csv.append({
-            'request_id': provisioning_request_id,
-            'status': status,
-            'elapsed_time': elapsed_time
-        })
-    else:
-        Results.append(f"EID {eid} does not have a Verizon profile in the Ready state present.")
-
-    with open('results.csv', 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-        writer.writeheader()
-        writer.writerows(results_csv)
-
-    return render_template('terminate_vzw.html', Results=Results)
+    job, messages = run_single_job('terminate_vzw', (account_id, eid), terminate_vzw_workflow, SWITCH_FIELDS)
+
+    return render_template('terminate_vzw.html', Results=messages,
+                           results_url=url_for('job_results', job_id=job.id))
 
 
 @app.route('/terminate_att', methods=['POST'])
@@ -456,6 +484,11 @@ def terminate_att_profile():
     It accepts either a file upload containing CSV data or form data.
     It processes each row in the CSV or the form data, checking the
     Verizon profile status and initiates a profile termination if it's present.
+    A CSV upload is queued as a background job (see /jobs/<job_id>) whose
+    rows are processed concurrently by a bounded pool of workers;
+    results.csv keeps the order of the rows. If the 'bulk' form field is set,
+    the Ready profiles are terminated with multi-subscription provisioning
+    requests (see bulk_terminate_workflow).
 
     In case of a CSV file, it's expected to contain a column with the
     name 'eid' in the 4th position (0-indexed).
@@ -468,88 +501,81 @@ def terminate_att_profile():
                          along with the results of the profile
                          termination attempts.
 
-        results.csv: A CSV file will be created in the root directory
+        results.csv: A CSV file will be created for the job
                      containing the results of the profile termination.
-                     It contains the request_id, status, and elapsed_time
+                     It contains the eid, request_id, status, and elapsed_time
                      for each termination attempt.
     """
-    global results_csv
-    Results.clear()
-    results_csv.clear()
     if 'csvFile' in request.files:
         csv_file = request.files['csvFile']
         if csv_file.filename.endswith('.csv'):
-            csv_data = csv_file.read().decode('utf-8')
-            reader = csv.reader(csv_data.splitlines())
-            next(reader)
-            for row in reader:
-                eid = row[4]
-
-                has_att, subscription_id = check_att(account_id, eid)
-
-                if has_att:
-                    start_time = time.time()
-                    provisioning_request_id = terminate_profile(account_id, subscription_id)
-                    time.sleep(1)
-                    status = check_provisioning_request_status(account_id, provisioning_request_id)
-                    while status.lower() != "completed":
-                        time.sleep(1)
-                        status = check_provisioning_request_status(account_id, provisioning_request_id)
-                        if status.lower() == "failed":
-                            Results.append(f"Profile terminate for EID: {eid} has failed.")
-                            break
-                    Results.append(f"Profile terminated for EID: {eid}")
-                    end_time = time.time()
-                    elapsed_time = end_time - start_time
-                    Results.append(f"Elapsed Time: {elapsed_time} seconds")
-                    results_csv.append({
-                        'request_id': provisioning_request_id,
-                        'status': status,
-                        'elapsed_time': elapsed_time
-                    })
-                else:
-                    Results.append(f"EID {eid} does not have an ATT profile in the Ready state present.")
-
-            with open('results.csv', 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-                writer.writeheader()
-                writer.writerows(results_csv)
-
-            return render_template('terminate_att.html', Results=Results)
+            path = save_upload(csv_file)
+            if request.form.get('bulk'):
+                inventory = upload_inventory()
+                job = submit_bulk_job('terminate_att', path, 4,
+                                      lambda rows, on_result: bulk_terminate_workflow(account_id, 'att', [row[4] for row in rows],
+                                                                                      inventory=inventory, on_result=on_result),
+                                      SWITCH_FIELDS)
+            else:
+                job = submit_journaled_job('terminate_att', path, bool(request.form.get('inventory')))
+
+            return render_template('terminate_att.html', job_id=job.id)
 
     eid = request.form['eid']
 
-    has_att, subscription_id = check_att(account_id, eid)
-
-    if has_att:
-        start_time = time.time()
-        provisioning_request_id = terminate_profile(account_id, subscription_id)
-        time.sleep(1)
-        status = check_provisioning_request_status(account_id, provisioning_request_id)
-        while status.lower() != "completed":
-            time.sleep(1)
-            status = check_provisioning_request_status(account_id, provisioning_request_id)
-            if status.lower() == "failed":
-                Results.append(f"Profile terminate for EID: {eid} has failed.")
-                break
-        Results.append(f"Profile terminated for EID: {eid}")
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        Results.append(f"Elapsed Time: {elapsed_time} seconds")
-        results_csv.append({
-            'request_id': provisioning_request_id,
-            'status': status,
-            'elapsed_time': elapsed_time
-        })
-    else:
-        Results.append(f"EID {eid} does not have an ATT profile in the Ready state present.")
-
-    with open('results.csv', 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['request_id', 'status', 'elapsed_time'])
-        writer.writeheader()
-        writer.writerows(results_csv)
-
-    return render_template('terminate_att.html', Results=Results)
+    job, messages = run_single_job('terminate_att', (account_id, eid), terminate_att_workflow, SWITCH_FIELDS)
+
+    return render_template('terminate_att.html', Results=messages,
+                           results_url=url_for('job_results', job_id=job.id))
+
+
+@app.route('/swap_carrier', methods=['POST'])
+def swap_carrier():
+    """Process the swap carrier request.
+
+    This function handles the POST request to the '/swap_carrier' URL.
+    It accepts either a file upload containing CSV data or form data.
+    For each EID it terminates the Ready profile of the current carrier,
+    waits for the termination to complete, downloads the profile of the
+    carrier selected in the 'to_carrier' form field ('vzw' or 'att') and
+    waits for the switch request (see _swap_workflow). Each EID is looked
+    up once. A CSV upload is queued as a background job (see
+    /jobs/<job_id>) whose rows are processed concurrently, so different
+    EIDs are in different stages of the swap at the same time.
+
+    The CSV file and form data are laid out as for '/download_vzw'.
+
+    Returns:
+        render_template: A Flask response object that contains the
+                         rendered template string of 'swap_carrier.html',
+                         along with the results of the swaps.
+
+        results.csv: A button will be displayed to download the results
+                     as a csv, with one row per terminate and download
+                     step.
+    """
+    to_carrier = request.form.get('to_carrier', 'vzw')
+    if to_carrier not in SWAP_WORKFLOWS:
+        abort(400)
+    name = f"swap_to_{to_carrier}"
+    workflow = SWAP_WORKFLOWS[to_carrier]
+
+    if 'csvFile' in request.files:
+        csv_file = request.files['csvFile']
+        if csv_file.filename.endswith('.csv'):
+            path = save_upload(csv_file)
+            job = submit_journaled_job(name, path, bool(request.form.get('inventory')))
+
+            return render_template('swap_carrier.html', job_id=job.id)
+
+    eid = request.form['eid']
+    imei = request.form['imei']
+    bs_iccid = request.form['bs_iccid']
+
+    job, messages = run_single_job(name, (account_id, eid, imei, bs_iccid), workflow, SWAP_FIELDS)
+
+    return render_template('swap_carrier.html', Results=messages,
+                           results_url=url_for('job_results', job_id=job.id))
 
 
 @app.route('/query_eid', methods=['POST'])
@@ -559,14 +585,14 @@ def query_eid():
     This function handles the POST request to the '/query_eid' URL. It accepts either a CSV file upload
     or form data, and processes the provided EID(s), retrieving the profile information for each one.
 
-    In case of a CSV file, the file is expected to contain EIDs in the first column. For each EID,
-    this function retrieves the profile types and their state using the get_eid_information function.
+    In case of a CSV file, the file is expected to contain EIDs in the first column. The file is queued
+    as a background job (see /jobs/<job_id>) that retrieves the profile types and their state for each
+    EID from its EidState (see utils.eid_state).
 
     In case of form data, the data is expected to contain a field named 'eid'. This function retrieves
-    the profile types and their state for this EID using the get_eid_information function.
+    the profile types and their state for this EID from its EidState (see utils.eid_state).
 
-    The results are stored in a global Results list and a global results_csv list, which are both cleared
-    at the start of the function.
+    In case of form data, the query runs as a single-EID job whose results are scoped to that job.
 
     Returns:
         render_template: A Flask response object that contains the rendered template string of
@@ -577,69 +603,229 @@ def query_eid():
                      provided, it will contain the result for the single provided EID. The CSV file can
                      then be downloaded.
     """
-    Results.clear()
-    results_csv.clear()
     if 'csvFile' in request.files:
         csv_file = request.files['csvFile']
         if csv_file.filename.endswith('.csv'):
-            csv_data = csv_file.read().decode('utf-8')
-            reader = csv.reader(csv_data.splitlines())
-            next(reader)
-            Results.append("Profiles:")
-            for row in reader:
-                eid = row[0]
-                profiles = get_eid_information(account_id, eid)
-                for item in profiles:
-                    eid = eid
-                    profile, state = item
-                    Results.append(f"{eid} - {profile}: {state}")
-                    results_csv.append({
-                        'eid': eid,
-                        'profile': profile,
-                        'state': state
-                    })
-
-            with open('results.csv', 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['eid', 'profile', 'state'])
-                writer.writeheader()
-                writer.writerows(results_csv)
-
-            return render_template('query_eid.html', Results=Results)
+            path = save_upload(csv_file)
+            inventory = upload_inventory()
+            job = submit_batch_job('query_eid', path, query_item, partial(query_eid_workflow, inventory=inventory),
+                                   QUERY_FIELDS)
+
+            return render_template('query_eid.html', job_id=job.id)
 
     eid = request.form['eid']
 
-    profiles = get_eid_information(account_id, eid)
-    Results.append("Profiles:")
-    for item in profiles:
-        eid = eid
-        profile, state = item
-        Results.append(f"{eid} - {profile}: {state}")
-        results_csv.append({
-            'eid': eid,
-            'profile': profile,
-            'state': state
-        })
+    job, messages = run_single_job('query_eid', (account_id, eid), query_eid_workflow, QUERY_FIELDS)
+
+    return render_template('query_eid.html', Results=["Profiles:"] + messages,
+                           results_url=url_for('job_results', job_id=job.id))
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Reports the progress of a background job.
+
+    Returns:
+        Response: JSON with the job's status and done/failed/pending counts, or 404 if the job
+                  is unknown.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.progress())
+
+
+@app.route('/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """
+    Resumes a CSV job from its journal, e.g. after the app was restarted while it was running
+    (see submit_journaled_job).
+
+    Returns:
+        Response: JSON with the resumed job's progress and status 202, 404 if the job has no
+                  journal or its uploaded file is gone, or 409 if the job is still running.
+    """
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        abort(404)
+    path = journal_path(job_id)
+    if not os.path.exists(path):
+        abort(404)
+    with Journal(path) as journal:
+        meta = journal.meta or {}
+    if meta.get('name') not in JOURNALED_JOBS or not os.path.exists(meta.get('csv_path', '')):
+        abort(404)
+
+    job = submit_journaled_job(meta['name'], meta['csv_path'], meta.get('inventory', False), job_id)
+    if job is None:
+        abort(409)
+    return jsonify(job.progress()), 202
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Streams the per-EID results of a background job as Server-Sent Events.
+
+    A 'result' event carrying the EID, its result messages, elapsed time and the job's
+    done/failed/pending counts is sent as soon as each EID finishes, and an 'end' event
+    once the whole job has finished.
+
+    Returns:
+        Response: A 'text/event-stream' response, or 404 if the job is unknown.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+
+    def stream():
+        for event in job.events():
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+def verify_webhook():
+    """
+    Rejects a webhook call with 403 unless it carries the configured shared secret in the
+    'X-Webhook-Token' header. Every call is rejected if no secret is configured, so that nobody
+    can end a wait early with a forged notification.
+    """
+    if not webhook_secret or not hmac.compare_digest(request.headers.get('X-Webhook-Token', ''), webhook_secret):
+        abort(403)
+
 
-    with open('results.csv', 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['eid', 'profile', 'state'])
-        writer.writeheader()
-        writer.writerows(results_csv)
+@app.route('/webhooks/switch-requests', methods=['POST'])
+def switch_request_webhook():
+    """
+    Accepts a completion notification for an esim-profile-switch-request and wakes the workflow
+    waiting for it (see utils.notifications). Only used when KORE_WEBHOOKS_ENABLED is set.
 
-    return render_template('query_eid.html', Results=Results)
+    The JSON body is expected to contain the 'esim-profile-switch-request-id' (or 'request-id')
+    and the 'switch-request-status' (or 'status').
 
+    Returns:
+        Response: 204, 400 if the body is malformed, or 403 if the shared secret is wrong.
+    """
+    verify_webhook()
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    request_id = payload.get('esim-profile-switch-request-id') or payload.get('request-id')
+    status = payload.get('switch-request-status') or payload.get('status')
+    if not request_id or not status:
+        abort(400)
+    notifications.notify('switch', request_id, status)
+    return '', 204
+
+
+@app.route('/webhooks/provisioning-requests', methods=['POST'])
+def provisioning_request_webhook():
+    """
+    Accepts a completion notification for a provisioning request and wakes the workflow waiting
+    for it (see utils.notifications). Only used when KORE_WEBHOOKS_ENABLED is set.
+
+    The JSON body is expected to contain the 'provisioning-request-id' (or 'request-id') and
+    either a 'subscriptions' list with the 'subscription-id' and 'completion-status' of each
+    subscription, or the 'completion-status' (or 'status') of the request as a whole.
+
+    Returns:
+        Response: 204, 400 if the body is malformed, or 403 if the shared secret is wrong.
+    """
+    verify_webhook()
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    provisioning_request_id = payload.get('provisioning-request-id') or payload.get('request-id')
+    deactivation = payload.get('Deactivation', payload)
+    if not isinstance(deactivation, dict):
+        abort(400)
+    subscriptions = deactivation.get('subscriptions', [])
+    if not isinstance(subscriptions, list) or not all(isinstance(subscription, dict) for subscription in subscriptions):
+        abort(400)
+    statuses = {subscription.get('subscription-id'): subscription.get('completion-status', '')
+                for subscription in subscriptions if subscription.get('subscription-id')}
+    status = payload.get('completion-status') or payload.get('status')
+    if not provisioning_request_id or not (statuses or status):
+        abort(400)
+    notifications.notify('provisioning', provisioning_request_id, status, statuses)
+    return '', 204
+
+
+@app.route('/metrics')
+def metrics_page():
+    """
+    Exposes the API call latencies, HTTP status counts and poll counts in the Prometheus text format.
+
+    Returns:
+        Response: A 'text/plain' response in the Prometheus text exposition format.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/history/switch_times')
+def switch_times():
+    """
+    Reports percentile switch times per carrier and day from the operation history.
+
+    Accepts the optional query parameters 'carrier' ('vzw' or 'att'), 'operation' ('download',
+    the default, or 'terminate') and 'days' (30 by default).
+
+    Returns:
+        Response: JSON list with the completed and failed counts and the p50/p90/p95/p99
+                  elapsed times in seconds of each carrier and day.
+    """
+    carrier = request.args.get('carrier')
+    operation = request.args.get('operation', 'download')
+    days = request.args.get('days', 30, type=int)
+    return jsonify(history.switch_time_percentiles(carrier, operation, days))
+
+
+@app.route('/history/eids/<eid>')
+def eid_history(eid):
+    """
+    Lists the most recent download, terminate and query operations of an EID.
+
+    Returns:
+        Response: JSON list of the operations, newest first.
+    """
+    return jsonify(history.eid_history(eid))
+
+
+@app.route('/jobs/<job_id>/results')
+def job_results(job_id):
+    """
+    Initiates a file download of the results of a job. For a background job these are the
+    results written so far, so the file can be downloaded while the job is running.
+
+    Returns:
+        send_file: The job's results CSV file for download, or 404 if it does not exist.
+    """
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        abort(404)
+    path = results_path(job_id)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(os.path.abspath(path), as_attachment=True, download_name='results.csv')
 
 
 @app.route('/download_results')
 def download_results():
     """
-    Handles the routing to the 'download_results' page and initiates a file download
-    of 'results.csv'.
+    Handles the routing to the 'download_results' page, kept for old links. Redirects to the
+    results of the job given by the 'job_id' query parameter.
 
     Returns:
-        send_file: A CSV file 'results.csv' for download.
+        redirect: A redirect to /jobs/<job_id>/results, or 404 if no job ID was given.
     """
-    return send_file('results.csv', as_attachment=True)
+    job_id = request.args.get('job_id')
+    if not job_id:
+        abort(404)
+    return redirect(url_for('job_results', job_id=job_id))
 
 
 if __name__ == '__main__':
-    app.run()
+    app.run(threaded=True)
@@ -1,17 +1,19 @@
 import getpass
-from utils.init import get_access_token
+import os
 
 
 username = getpass.getuser()
-token_url = "https://api.korewireless.com/Api/api/token"
+api_base_url = os.environ.get("KORE_API_BASE_URL", "https://api.korewireless.com/connectivity/v1")
+token_url = os.environ.get("KORE_TOKEN_URL", "https://api.korewireless.com/Api/api/token")
 client_id = "CLIENT_ID"
 client_secret_key = "CLIENT_SECRET"
 api_key = "API_KEY"
 account_id = "ACCOUNT_ID"
+webhooks_enabled = os.environ.get("KORE_WEBHOOKS_ENABLED", "") == "1"
+webhook_secret = os.environ.get("KORE_WEBHOOK_SECRET", "")
 
 api_headers = {
         'x-api-key': api_key,
         'Content-Type': 'application/json',
-        'Accept': 'application/json',
-        'Authorization': 'Bearer ' + get_access_token(token_url, client_id, client_secret_key)
+        'Accept': 'application/json'
 }
@@ -39,3 +39,36 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 });
+
+
+/**
+ * Streams the per-EID results of a background job and appends them to the page as they arrive.
+ *
+ * @param {string} jobId - The ID of the job returned when the CSV was submitted.
+ */
+function streamJobEvents(jobId) {
+    var source = new EventSource('/jobs/' + jobId + '/events');
+    var progress = document.getElementById("jobProgress");
+    var list = document.getElementById("jobResults");
+
+    function showProgress(status, job) {
+        progress.textContent = status + " - done: " + job.done + ", failed: " + job.failed +
+            ", pending: " + (job.pending === null ? "counting..." : job.pending);
+    }
+
+    source.addEventListener('result', function(event) {
+        var result = JSON.parse(event.data);
+        result.messages.forEach(function(message) {
+            var item = document.createElement("li");
+            item.textContent = message;
+            list.appendChild(item);
+        });
+        showProgress("running", result);
+    });
+
+    source.addEventListener('end', function(event) {
+        var job = JSON.parse(event.data);
+        showProgress(job.status, job);
+        source.close();
+    });
+}
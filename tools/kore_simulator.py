@@ -0,0 +1,432 @@
+import argparse
+import itertools
+import random
+import threading
+import time
+import uuid
+import requests
+from flask import Flask, request, jsonify
+
+
+DEFAULT_DEVICES = 1000
+DEFAULT_LATENCY = 0.05
+DEFAULT_SWITCH_SECONDS = 3.0
+DEFAULT_PROVISIONING_SECONDS = 2.0
+DEFAULT_TOKEN_LIFETIME = 3600
+
+BOOTSTRAP_OFFER = ('32', 'OmniSIM Rush')
+CARRIER_OFFERS = {
+    'cmp-prov-ap-12548': ('19', 'OmniSIM KVZW Downloadable'),
+    'cmp-prov-ap-11052': ('26', 'OmniSIM KATTCC Downloadable')
+}
+
+
+def device(index):
+    """
+    Returns the seeded device with the given index.
+
+    Args:
+        index (int): The index of the device, from 0.
+
+    Returns:
+        tuple[str, str, str]: The (eid, imei, bs_iccid) of the device.
+    """
+    return f"8904903200{index:022d}", f"35{index:013d}", f"89010{index:014d}"
+
+
+class SimulatorConfig:
+    """
+    The behaviour of the simulated Kore Wireless API.
+
+    Args:
+        devices (int): The number of seeded devices (see device).
+        latency (float): The mean delay in seconds added to every response.
+        latency_jitter (float): The fraction of the latency to randomise by, between 0 and 1.
+        error_rate (float): The fraction of API calls answered with a 500, between 0 and 1.
+        switch_seconds (float): Seconds until a switch request reaches a final status.
+        switch_failure_rate (float): The fraction of switch requests that fail, between 0 and 1.
+        provisioning_seconds (float): Seconds until a provisioning request reaches a final status.
+        provisioning_failure_rate (float): The fraction of terminations that fail, between 0 and 1.
+        token_lifetime (int): The expires_in of issued access tokens, in seconds.
+        webhook_url (str, optional): The base URL of the app's webhook routes. When set, completion
+                                     notifications are posted to it as requests finish.
+        webhook_secret (str, optional): Sent as the X-Webhook-Token header of the notifications.
+        quota (float, optional): The number of calls per second answered before further calls in the
+                                 same second are answered with 429 and a Retry-After header.
+        preload (str, optional): An activation profile whose carrier subscription is seeded in the
+                                 Ready state on every device, e.g. to benchmark terminations.
+        seed (int, optional): Seeds the random failures and jitter for reproducible runs.
+    """
+
+    def __init__(self, devices=DEFAULT_DEVICES, latency=DEFAULT_LATENCY, latency_jitter=0.2, error_rate=0.0,
+                 switch_seconds=DEFAULT_SWITCH_SECONDS, switch_failure_rate=0.0,
+                 provisioning_seconds=DEFAULT_PROVISIONING_SECONDS, provisioning_failure_rate=0.0,
+                 token_lifetime=DEFAULT_TOKEN_LIFETIME, webhook_url=None, webhook_secret=None, quota=None, preload=None,
+                 seed=None):
+        self.devices = devices
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.switch_seconds = switch_seconds
+        self.switch_failure_rate = switch_failure_rate
+        self.provisioning_seconds = provisioning_seconds
+        self.provisioning_failure_rate = provisioning_failure_rate
+        self.token_lifetime = token_lifetime
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.quota = quota
+        self.preload = preload
+        self.seed = seed
+
+
+class SimulatorState:
+    """
+    The subscriptions, switch requests and provisioning requests of the simulated API.
+
+    Requests reach their final status switch_seconds or provisioning_seconds after they were
+    submitted, at which point their effect is applied to the subscriptions: a completed download
+    adds a Ready carrier subscription to the EID and a completed termination moves the
+    subscription to the Terminated state. All methods are thread-safe.
+
+    Args:
+        config (SimulatorConfig): The behaviour of the simulator.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._subscriptions = {}
+        self._by_id = {}
+        self._switch_requests = {}
+        self._provisioning_requests = {}
+        self._pending = []
+        self._calls = {}
+        self._window = (0, 0)
+        self._throttled = 0
+        for index in range(config.devices):
+            eid, imei, bs_iccid = device(index)
+            self._add_subscription(eid, bs_iccid, BOOTSTRAP_OFFER, 'Active')
+            if config.preload:
+                self._add_subscription(eid, f"89011{index:014d}", CARRIER_OFFERS[config.preload], 'Ready')
+
+    def _add_subscription(self, eid, iccid, offer, state):
+        service_type_id, product_offer = offer
+        subscription = {
+            'subscription-id': f"cmp-k1-subscription-{next(self._ids)}",
+            'eid': eid,
+            'iccid': iccid,
+            'service-type-id': service_type_id,
+            'product-offer': product_offer,
+            'states': [{'state': state, 'is-current': True}]
+        }
+        self._subscriptions.setdefault(eid, []).append(subscription)
+        self._by_id[subscription['subscription-id']] = subscription
+        return subscription
+
+    def _track(self, entry, seconds, failure_rate):
+        self._pending.append((entry, seconds, failure_rate))
+        return entry
+
+    def _settle(self, entry, seconds, failure_rate):
+        if entry['status'] == 'pending' and time.monotonic() - entry['created'] >= seconds:
+            entry['status'] = 'failed' if self.random.random() < failure_rate else 'completed'
+            if entry['status'] == 'completed':
+                entry['apply']()
+        return entry['status']
+
+    def _settle_all(self):
+        self._pending = [pending for pending in self._pending if self._settle(*pending) == 'pending']
+
+    def _notify_later(self, seconds, path, settle):
+        """
+        Settles a request once it is due and posts the notification built by settle to the
+        webhook URL, if one is configured.
+        """
+        if not self.config.webhook_url:
+            return
+
+        def notify():
+            with self._lock:
+                payload = settle()
+            try:
+                headers = {'X-Webhook-Token': self.config.webhook_secret} if self.config.webhook_secret else {}
+                requests.post(f"{self.config.webhook_url}/{path}", json=payload, headers=headers, timeout=5)
+            except requests.RequestException as e:
+                print(f"Error: {str(e)}")
+
+        timer = threading.Timer(seconds, notify)
+        timer.daemon = True
+        timer.start()
+
+    def count_call(self, endpoint):
+        with self._lock:
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+
+    def throttle(self):
+        """
+        Returns:
+            bool: Whether the current call is over the quota and is answered with a 429.
+        """
+        if not self.config.quota:
+            return False
+        with self._lock:
+            second = int(time.monotonic())
+            window, calls = self._window
+            calls = calls + 1 if window == second else 1
+            self._window = (second, calls)
+            if calls > self.config.quota:
+                self._throttled += 1
+                return True
+            return False
+
+    def delay(self):
+        """
+        Returns:
+            float: The jittered response latency in seconds.
+        """
+        with self._lock:
+            jitter = self.random.uniform(1 - self.config.latency_jitter, 1 + self.config.latency_jitter)
+        return self.config.latency * jitter
+
+    def should_fail(self):
+        """
+        Returns:
+            bool: Whether the current call is answered with a 500.
+        """
+        with self._lock:
+            return self.random.random() < self.config.error_rate
+
+    def subscriptions(self, eid, page_index, page_size):
+        with self._lock:
+            self._settle_all()
+            if eid:
+                matches = self._subscriptions.get(eid, [])
+            else:
+                matches = [subscription for subscriptions in self._subscriptions.values()
+                           for subscription in subscriptions]
+            return matches[page_index * page_size:(page_index + 1) * page_size]
+
+    def download(self, activation_profile_id, subscriptions):
+        offer = CARRIER_OFFERS.get(activation_profile_id)
+        if offer is None:
+            return None
+        request_id = f"cmp-cpro-request-{uuid.uuid4().hex[:12]}"
+
+        def apply():
+            for entry in subscriptions:
+                iccid = f"89011{self.random.randrange(10 ** 14):014d}"
+                self._add_subscription(entry['eid'], iccid, offer, 'Ready')
+
+        with self._lock:
+            self._switch_requests[request_id] = self._track(
+                {'status': 'pending', 'created': time.monotonic(), 'apply': apply},
+                self.config.switch_seconds, self.config.switch_failure_rate)
+
+        def settle():
+            entry = self._switch_requests[request_id]
+            status = self._settle(entry, self.config.switch_seconds, self.config.switch_failure_rate)
+            return {'esim-profile-switch-request-id': request_id, 'switch-request-status': status}
+
+        self._notify_later(self.config.switch_seconds, 'switch-requests', settle)
+        return request_id
+
+    def switch_status(self, request_id):
+        with self._lock:
+            entry = self._switch_requests.get(request_id)
+            if entry is None:
+                return None
+            return self._settle(entry, self.config.switch_seconds, self.config.switch_failure_rate)
+
+    def terminate(self, subscription_ids):
+        provisioning_request_id = f"cmp-pp-request-{uuid.uuid4().hex[:12]}"
+        entries = {}
+
+        def make_apply(subscription_id):
+            def apply():
+                subscription = self._by_id.get(subscription_id)
+                if subscription is not None:
+                    for state in subscription['states']:
+                        state['is-current'] = False
+                    subscription['states'].append({'state': 'Terminated', 'is-current': True})
+            return apply
+
+        with self._lock:
+            for subscription_id in subscription_ids:
+                entries[subscription_id] = self._track(
+                    {'status': 'pending', 'created': time.monotonic(), 'apply': make_apply(subscription_id)},
+                    self.config.provisioning_seconds, self.config.provisioning_failure_rate)
+            self._provisioning_requests[provisioning_request_id] = entries
+
+        def settle():
+            return {'provisioning-request-id': provisioning_request_id, 'subscriptions': [
+                {'subscription-id': subscription_id,
+                 'completion-status': self._settle(entry, self.config.provisioning_seconds,
+                                                   self.config.provisioning_failure_rate)}
+                for subscription_id, entry in entries.items()
+            ]}
+
+        self._notify_later(self.config.provisioning_seconds, 'provisioning-requests', settle)
+        return provisioning_request_id
+
+    def provisioning_statuses(self, provisioning_request_id):
+        with self._lock:
+            entries = self._provisioning_requests.get(provisioning_request_id)
+            if entries is None:
+                return None
+            return {subscription_id: self._settle(entry, self.config.provisioning_seconds,
+                                                  self.config.provisioning_failure_rate)
+                    for subscription_id, entry in entries.items()}
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of calls per endpoint, in total and answered with 429, and the requests
+                  submitted so far.
+        """
+        with self._lock:
+            return {
+                'calls': dict(self._calls),
+                'total_calls': sum(self._calls.values()),
+                'throttled_calls': self._throttled,
+                'switch_requests': len(self._switch_requests),
+                'provisioning_requests': len(self._provisioning_requests)
+            }
+
+
+def create_app(config=None):
+    """
+    Creates the simulator app. The Kore Wireless API is served under /connectivity/v1 and the
+    token endpoint under /Api/api/token, so the app can stand in for api.korewireless.com by
+    pointing KORE_API_BASE_URL and KORE_TOKEN_URL at it. /sim/stats reports the API calls made.
+
+    Args:
+        config (SimulatorConfig, optional): The behaviour of the simulator.
+
+    Returns:
+        Flask: The simulator app. Its state is app.config['SIMULATOR'].
+    """
+    app = Flask(__name__)
+    state = SimulatorState(config or SimulatorConfig())
+    app.config['SIMULATOR'] = state
+
+    def simulate(endpoint):
+        state.count_call(endpoint)
+        if state.throttle():
+            return jsonify({'error': 'quota exceeded'}), 429, {'Retry-After': '1'}
+        time.sleep(state.delay())
+        if state.should_fail():
+            return jsonify({'error': 'simulated failure'}), 500
+        return None
+
+    @app.route('/Api/api/token', methods=['POST'])
+    def token():
+        failure = simulate('token')
+        if failure:
+            return failure
+        return jsonify({'access_token': uuid.uuid4().hex, 'token_type': 'Bearer',
+                        'expires_in': state.config.token_lifetime})
+
+    @app.route('/connectivity/v1/accounts/<account_id>/subscriptions')
+    def subscriptions(account_id):
+        failure = simulate('subscriptions')
+        if failure:
+            return failure
+        page = state.subscriptions(request.args.get('eid', ''),
+                                   request.args.get('page-index', 0, type=int),
+                                   request.args.get('max-page-item', 10, type=int))
+        return jsonify({'subscriptions': page})
+
+    @app.route('/connectivity/v1/accounts/<account_id>/esim-profile-download-requests', methods=['POST'])
+    def download_requests(account_id):
+        failure = simulate('esim-profile-download-requests')
+        if failure:
+            return failure
+        download = (request.get_json(force=True) or {}).get('download', {})
+        request_id = state.download(download.get('activation-profile-id'), download.get('subscriptions', []))
+        if request_id is None:
+            return jsonify({'error': 'unknown activation profile'}), 400
+        return jsonify({'data': {'request-id': request_id}})
+
+    @app.route('/connectivity/v1/accounts/<account_id>/esim-profile-switch-requests/retry', methods=['POST'])
+    def switch_request_retry(account_id):
+        failure = simulate('esim-profile-switch-requests/retry')
+        if failure:
+            return failure
+        return jsonify({'status': 'pending'})
+
+    @app.route('/connectivity/v1/accounts/<account_id>/esim-profile-switch-requests/<request_id>')
+    def switch_request(account_id, request_id):
+        failure = simulate('esim-profile-switch-requests')
+        if failure:
+            return failure
+        status = state.switch_status(request_id)
+        if status is None:
+            return jsonify({'error': 'unknown switch request'}), 404
+        return jsonify({'switch-request-status': status})
+
+    @app.route('/connectivity/v1/accounts/<account_id>/provisioning-requests/terminate', methods=['POST'])
+    def terminate(account_id):
+        failure = simulate('provisioning-requests/terminate')
+        if failure:
+            return failure
+        entries = (request.get_json(force=True) or {}).get('terminate', {}).get('subscriptions', [])
+        provisioning_request_id = state.terminate([entry.get('subscription-id') for entry in entries])
+        return jsonify({'data': {'provisioning-request-id': provisioning_request_id}})
+
+    @app.route('/connectivity/v1/accounts/<account_id>/provisioning-requests/<provisioning_request_id>')
+    def provisioning_request(account_id, provisioning_request_id):
+        failure = simulate('provisioning-requests')
+        if failure:
+            return failure
+        statuses = state.provisioning_statuses(provisioning_request_id)
+        if statuses is None:
+            return jsonify({'error': 'unknown provisioning request'}), 404
+        return jsonify({'Deactivation': {'subscriptions': [
+            {'subscription-id': subscription_id, 'completion-status': status}
+            for subscription_id, status in statuses.items()
+        ]}})
+
+    @app.route('/sim/stats')
+    def stats():
+        return jsonify(state.stats())
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serves a local stand-in for the Kore Wireless API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--devices', type=int, default=DEFAULT_DEVICES)
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--switch-seconds', type=float, default=DEFAULT_SWITCH_SECONDS)
+    parser.add_argument('--switch-failure-rate', type=float, default=0.0)
+    parser.add_argument('--provisioning-seconds', type=float, default=DEFAULT_PROVISIONING_SECONDS)
+    parser.add_argument('--provisioning-failure-rate', type=float, default=0.0)
+    parser.add_argument('--token-lifetime', type=int, default=DEFAULT_TOKEN_LIFETIME)
+    parser.add_argument('--webhook-url', help="e.g. http://127.0.0.1:5000/webhooks")
+    parser.add_argument('--webhook-secret', help="The KORE_WEBHOOK_SECRET of the app.")
+    parser.add_argument('--quota', type=float)
+    parser.add_argument('--preload', choices=sorted(CARRIER_OFFERS))
+    parser.add_argument('--seed', type=int)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args):
+    """
+    Builds a SimulatorConfig from the parsed command line arguments (see parse_args).
+    """
+    return SimulatorConfig(devices=args.devices, latency=args.latency, error_rate=args.error_rate,
+                           switch_seconds=args.switch_seconds, switch_failure_rate=args.switch_failure_rate,
+                           provisioning_seconds=args.provisioning_seconds,
+                           provisioning_failure_rate=args.provisioning_failure_rate,
+                           token_lifetime=args.token_lifetime, webhook_url=args.webhook_url,
+                           webhook_secret=args.webhook_secret, quota=args.quota, preload=args.preload, seed=args.seed)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    create_app(config_from_args(args)).run(host=args.host, port=args.port, threaded=True)
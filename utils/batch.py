@@ -0,0 +1,120 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+BATCH_WORKERS = 8
+BATCH_WINDOW = 4
+
+
+def _run_isolated(worker, item, on_error):
+    """
+    Runs a single batch item, turning any exception into a result via on_error.
+
+    Args:
+        worker (callable): The per-item workflow, called as worker(*item).
+        item (tuple): The positional arguments for the worker.
+        on_error (callable): Called as on_error(item, exception) when the worker raises.
+
+    Returns:
+        The worker's return value, or on_error's return value if the worker raised.
+
+    """
+    try:
+        return worker(*item)
+    except Exception as e:
+        return on_error(item, e)
+
+
+def iter_batch(items, worker, on_error, max_workers=BATCH_WORKERS, window=None):
+    """
+    Runs a per-EID workflow over a stream of items using a bounded pool of worker threads.
+
+    Items are pulled from the iterable only as fast as the workers can take them: at most
+    window items are submitted but not yet yielded at any time, so an iterable that parses a
+    large file row by row is consumed in bounded memory and the first items are dispatched
+    before the rest has been read. Each item is processed independently: an exception raised
+    while processing one item is passed to on_error and does not affect the other items.
+    Results are yielded in the same order as the input items regardless of the order in which
+    the workers finish.
+
+    Args:
+        items (iterable[tuple]): The positional arguments for each call to the worker.
+        worker (callable): The per-item workflow, called as worker(*item).
+        on_error (callable): Called as on_error(item, exception) when the worker raises.
+        max_workers (int): The maximum number of items processed at the same time. The shared
+                           HTTP pool in utils.client should be at least this large.
+        window (int, optional): The maximum number of items in flight, including finished items
+                                waiting for an earlier item. Defaults to BATCH_WINDOW * max_workers.
+
+    Yields:
+        The result of each item, in input order.
+
+    """
+    window = window or BATCH_WINDOW * max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(_run_isolated, worker, item, on_error))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_batch(items, worker, on_error, max_workers=BATCH_WORKERS):
+    """
+    Runs a per-EID workflow over a batch of items and returns all results. See iter_batch.
+
+    Args:
+        items (iterable[tuple]): The positional arguments for each call to the worker.
+        worker (callable): The per-item workflow, called as worker(*item).
+        on_error (callable): Called as on_error(item, exception) when the worker raises.
+        max_workers (int): The maximum number of items processed at the same time.
+
+    Returns:
+        list: The result of each item, in input order.
+
+    """
+    return list(iter_batch(items, worker, on_error, max_workers))
+
+
+class _Raised:
+    """
+    Marks a result built by on_error, for iter_batch_items.
+    """
+
+    __slots__ = ('result',)
+
+    def __init__(self, result):
+        self.result = result
+
+
+def iter_batch_items(items, worker, on_error, max_workers=BATCH_WORKERS):
+    """
+    Runs a per-EID workflow over a stream of items like iter_batch, yielding each item with its
+    result, for callers that need to know which item a result belongs to and whether it came
+    from on_error.
+
+    Args:
+        items (iterable[tuple]): The positional arguments for each call to the worker.
+        worker (callable): The per-item workflow, called as worker(*item).
+        on_error (callable): Called as on_error(item, exception) when the worker raises.
+        max_workers (int): The maximum number of items processed at the same time.
+
+    Yields:
+        tuple: (item, result, raised) for each item, in input order.
+
+    """
+    pending = deque()
+
+    def queued():
+        for item in items:
+            pending.append(item)
+            yield item
+
+    for result in iter_batch(queued(), worker, lambda item, e: _Raised(on_error(item, e)), max_workers):
+        item = pending.popleft()
+        if isinstance(result, _Raised):
+            yield item, result.result, True
+        else:
+            yield item, result, False
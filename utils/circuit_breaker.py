@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+import requests
+
+
+WINDOW_SIZE = 20
+MIN_CALLS = 10
+FAILURE_RATE = 0.5
+OPEN_SECONDS = 30.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ApiUnavailable(requests.RequestException):
+    """
+    Raised instead of calling the API while the circuit breaker of the endpoint class is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling an endpoint class once too many recent calls failed, and probes for recovery.
+
+    The breaker trips (opens) when at least failure_rate of the last window_size calls failed,
+    once min_calls calls were made. While open, calls fail immediately with ApiUnavailable.
+    After open_seconds a single probe call is let through (half open): if it succeeds the
+    breaker closes, otherwise it opens again for another open_seconds.
+
+    A call fails if it raised a connection error or timeout or was answered with a 5xx status.
+
+    Args:
+        name (str): The endpoint class, used in error messages.
+        window_size (int): The number of recent calls the failure rate is computed over.
+        min_calls (int): The number of calls needed before the breaker may trip.
+        failure_rate (float): The fraction of failed calls that trips the breaker.
+        open_seconds (float): Seconds the breaker stays open before probing.
+    """
+
+    def __init__(self, name, window_size=WINDOW_SIZE, min_calls=MIN_CALLS, failure_rate=FAILURE_RATE,
+                 open_seconds=OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._results = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Checks whether a call may be made.
+
+        Raises:
+            ApiUnavailable: If the breaker is open, or half open with a probe already in flight.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise ApiUnavailable(f"Kore API unavailable: the {self.name} circuit is open.")
+
+    def record(self, success):
+        """
+        Records the outcome of a call.
+
+        Args:
+            success (bool): Whether the call succeeded.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if success:
+                    self.state = CLOSED
+                    self._results.clear()
+                else:
+                    self._open()
+                return
+
+            self._results.append(success)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures >= self.failure_rate * len(self._results):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+
+breakers = {endpoint_class: CircuitBreaker(endpoint_class) for endpoint_class in ('read', 'write', 'token')}
+
+
+def is_failure(status_code):
+    """
+    Returns:
+        bool: Whether a response status counts as a failure for the circuit breaker.
+    """
+    return status_code >= 500
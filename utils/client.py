@@ -0,0 +1,103 @@
+import requests
+from requests.adapters import HTTPAdapter
+from utils.circuit_breaker import breakers, is_failure
+from utils.metrics import count_response
+from utils.rate_limit import rate_limiter, retry_after, endpoint_class
+
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+MAX_THROTTLE_RETRIES = 5
+
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json'
+}
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """
+    Creates a keep-alive requests Session with a connection pool for the Kore Wireless API.
+
+    Args:
+        pool_connections (int): The number of host pools to cache.
+        pool_maxsize (int): The maximum number of connections kept alive per host. This should be
+                            at least the number of threads that call the API at the same time.
+
+    Returns:
+        requests.Session: A session with the pooled adapter mounted, the default headers set and
+                          the HTTP status of every response counted (see utils.metrics).
+
+    """
+    new_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    new_session.mount('https://', adapter)
+    new_session.mount('http://', adapter)
+    new_session.headers.update(DEFAULT_HEADERS)
+    new_session.hooks['response'].append(count_response)
+    return new_session
+
+
+session = create_session()
+
+
+def configure_pool(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """
+    Replaces the shared session with one using the given pool size.
+
+    Args:
+        pool_connections (int): The number of host pools to cache.
+        pool_maxsize (int): The maximum number of connections kept alive per host.
+
+    Returns:
+        None
+
+    """
+    global session
+    old_session = session
+    session = create_session(pool_connections, pool_maxsize)
+    old_session.close()
+
+
+def api_request(method, url, **kwargs):
+    """
+    Sends a request through the shared keep-alive session.
+
+    All Kore Wireless API calls go through this function so that they reuse pooled
+    TCP/TLS connections instead of opening a new one per call, and so that they share the
+    process-wide rate limits of utils.rate_limit. A caller blocks until its endpoint class has
+    capacity, which slows the batch workers down to the quota. A 429 response pauses the
+    endpoint class for the Retry-After time and the request is retried, up to
+    MAX_THROTTLE_RETRIES times. Every call goes through the circuit breaker of its endpoint
+    class (see utils.circuit_breaker), so that calls fail fast while the API is down.
+
+    Args:
+        method (str): The HTTP method, e.g. "GET" or "POST".
+        url (str): The URL to send the request to.
+        **kwargs: Passed through to requests.Session.request. Headers given here are
+                  merged over the session's default headers.
+
+    Returns:
+        requests.Response: The response of the request.
+
+    Raises:
+        utils.circuit_breaker.ApiUnavailable: If the circuit breaker of the endpoint class is open.
+        requests.HTTPError: If the request is still answered with 429 after the retries.
+        requests.RequestException: If an error occurs while making the request.
+
+    """
+    bucket = rate_limiter.bucket(method, url)
+    breaker = breakers[endpoint_class(method, url)]
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        breaker.before_call()
+        bucket.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(not is_failure(response.status_code))
+        if response.status_code != 429:
+            return response
+        bucket.pause(retry_after(response.headers.get('Retry-After'), attempt))
+    response.raise_for_status()
@@ -0,0 +1,56 @@
+import csv
+import os
+import uuid
+
+
+UPLOAD_FOLDER = 'uploads'
+
+
+def save_upload(csv_file, folder=UPLOAD_FOLDER):
+    """
+    Saves an uploaded CSV file to disk without loading it into memory.
+
+    The file is copied in chunks, so that a background job can parse it row by row after the
+    request that uploaded it has ended.
+
+    Args:
+        csv_file (FileStorage): The uploaded CSV file.
+        folder (str): The directory to save the file in.
+
+    Returns:
+        str: The path of the saved file.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{uuid.uuid4().hex}.csv")
+    csv_file.save(path)
+    return path
+
+
+def count_csv_rows(path):
+    """
+    Counts the data rows of a CSV file without keeping them in memory.
+
+    Args:
+        path (str): The path of the CSV file.
+
+    Returns:
+        int: The number of data rows, not counting the header row.
+    """
+    return sum(1 for row in iter_csv_rows(path))
+
+
+def iter_csv_rows(path):
+    """
+    Yields the data rows of a CSV file one at a time, skipping the header row.
+
+    Args:
+        path (str): The path of the CSV file.
+
+    Yields:
+        list[str]: The next data row.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            yield row
@@ -0,0 +1,139 @@
+from utils.init import SVCTOPROD
+
+
+VZW_PRODUCT = SVCTOPROD["19"]
+ATT_PRODUCT = SVCTOPROD["26"]
+
+
+class Profile:
+    """
+    One subscription (profile) of an EID.
+
+    Attributes:
+        subscription_id (str): The subscription ID.
+        iccid (str): The ICCID of the profile.
+        service_type (str or None): The product name of the service type, via SVCTOPROD.
+        product (str or None): The product offer, falling back to service_type.
+        state (str): The current state, or '' if no state is marked current.
+        states (tuple[str]): Every state listed for the subscription.
+    """
+
+    __slots__ = ('subscription_id', 'iccid', 'service_type', 'product', 'state', 'states')
+
+    def __init__(self, subscription_id, iccid, service_type, product, state, states):
+        self.subscription_id = subscription_id
+        self.iccid = iccid
+        self.service_type = service_type
+        self.product = product
+        self.state = state
+        self.states = states
+
+
+class EidState:
+    """
+    The profiles of an EID, indexed by product and current state.
+
+    Built from a subscriptions snapshot in a single pass, it answers every question the
+    workflows ask about an EID (the active ICCID, whether a carrier profile is Ready and its
+    subscription ID, the current state of each profile) without walking the JSON again.
+
+    Attributes:
+        eid (str): The EID.
+        profiles (tuple[Profile]): The profiles, in the order of the snapshot.
+        active_iccid (str or None): The ICCID of the first profile whose current state is 'Active'.
+        found (bool): False if the subscriptions could not be retrieved.
+    """
+
+    __slots__ = ('eid', 'profiles', 'active_iccid', 'found', '_index')
+
+    def __init__(self, eid, profiles=(), active_iccid=None, found=True):
+        self.eid = eid
+        self.profiles = tuple(profiles)
+        self.active_iccid = active_iccid
+        self.found = found
+        self._index = {}
+        for profile in self.profiles:
+            for name in {profile.product, profile.service_type} - {None}:
+                self._index.setdefault((name, profile.state), profile)
+
+    @classmethod
+    def from_snapshot(cls, eid, snapshot):
+        """
+        Builds the state of an EID from a subscriptions snapshot.
+
+        Args:
+            eid (str): The EID.
+            snapshot (dict or None): A response from get_subscription_snapshot, or None if the
+                                     request failed.
+
+        Returns:
+            EidState: The state of the EID. It has no profiles and found=False if snapshot is None.
+        """
+        if snapshot is None:
+            return cls(eid, found=False)
+
+        profiles = []
+        active_iccid = None
+        for subscription in snapshot.get('subscriptions', []):
+            current = ''
+            states = []
+            for state in subscription.get('states', []):
+                name = state.get('state', '')
+                states.append(name)
+                if state.get('is-current'):
+                    current = name
+            service_type = SVCTOPROD.get(subscription.get('service-type-id'))
+            profile = Profile(subscription.get('subscription-id', ''), subscription.get('iccid'), service_type,
+                              subscription.get('product-offer') or service_type, current, tuple(states))
+            if active_iccid is None and profile.state == 'Active':
+                active_iccid = profile.iccid
+            profiles.append(profile)
+        return cls(eid, profiles, active_iccid)
+
+    def find(self, product, state):
+        """
+        Args:
+            product (str): The product offer or service type name, e.g. VZW_PRODUCT.
+            state (str): The current state, e.g. 'Ready'.
+
+        Returns:
+            Profile or None: The first profile of the product whose current state is state.
+        """
+        return self._index.get((product, state))
+
+    def ready_profile(self, product):
+        """
+        Args:
+            product (str): The product offer or service type name, e.g. VZW_PRODUCT.
+
+        Returns:
+            Profile or None: The first profile of the product currently in the 'Ready' state.
+        """
+        return self.find(product, 'Ready')
+
+    def check_ready(self, product):
+        """
+        Args:
+            product (str): The product offer or service type name, e.g. VZW_PRODUCT.
+
+        Returns:
+            tuple: A tuple (bool, str) where the boolean is True if a profile of the product is
+                   'Ready', False if not, and None if the subscriptions could not be retrieved,
+                   and the str is the subscription ID of the Ready profile, '' otherwise.
+        """
+        if not self.found:
+            return (None, '')
+        profile = self.ready_profile(product)
+        if profile is None:
+            return (False, '')
+        return (True, profile.subscription_id)
+
+    def profile_states(self):
+        """
+        Returns:
+            list[tuple[str, str]] or None: The (service type, current state) of each profile, or
+                                           None if the subscriptions could not be retrieved.
+        """
+        if not self.found:
+            return None
+        return [(profile.service_type, profile.state) for profile in self.profiles]
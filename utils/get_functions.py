@@ -1,37 +1,74 @@
 import requests
-from static.credentials import api_headers
-from utils.init import SVCTOPROD
+from static.credentials import api_base_url, api_headers
+from utils.circuit_breaker import ApiUnavailable
+from utils.client import api_request
+from utils.metrics import timed
+from utils.token_manager import token_manager
+from utils.eid_state import EidState, VZW_PRODUCT, ATT_PRODUCT
 
 
-def get_iccid_with_active_state(account_id, eid):
+SNAPSHOT_PAGE_SIZE = 100
+
+
+@timed
+def get_subscriptions_page(account_id, page_index, page_size, eid=''):
     """
-    Retrieves the ICCID of the subscription with an active state for the given account ID and EID.
+    Retrieves one page of the subscriptions of the given account, optionally filtered by EID.
 
     Args:
         account_id (str): The ID of the account.
-        eid (str): The EID to filter the subscriptions.
+        page_index (int): The 0-based index of the page.
+        page_size (int): The maximum number of subscriptions on the page.
+        eid (str): The EID to filter the subscriptions, or '' for all subscriptions of the account.
 
     Returns:
-        str or None: The ICCID of the subscription with an active state, or None if not found.
+        list[dict]: The subscriptions on the page. A page shorter than page_size is the last one.
 
     Raises:
         requests.RequestException: If an error occurs while making the API request.
-
     """
-
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/subscriptions?page-index=0&max-page-item=10&imsi=&iccid=&eid={eid}&sim-state=&msisdn="
+    url = f"{api_base_url}/accounts/{account_id}/subscriptions?page-index={page_index}&max-page-item={page_size}&imsi=&iccid=&eid={eid}&sim-state=&msisdn="
     payload = {}
     headers = api_headers
 
+    response = api_request("GET", url, headers=headers, data=payload, auth=token_manager)
+    return response.json().get("subscriptions", [])
+
+
+@timed
+def get_subscription_snapshot(account_id, eid):
+    """
+    Retrieves the subscriptions for the given account ID and EID.
+
+    The parsed response can be passed as ``snapshot`` to get_eid_state (and to
+    get_iccid_with_active_state, check_verizon, check_att and get_eid_information) so that
+    a workflow only pays for one round trip per EID instead of one per question. Further pages are only requested
+    for an EID with more than SNAPSHOT_PAGE_SIZE subscriptions, so none are left out.
+
+    Args:
+        account_id (str): The ID of the account.
+        eid (str): The EID to filter the subscriptions.
+
+    Returns:
+        dict or None: The subscriptions response, or None if the request failed.
+
+    Raises:
+        ApiUnavailable: If the circuit breaker of the API is open (see utils.circuit_breaker).
+
+    """
+    subscriptions = []
+    page_index = 0
+
     try:
-        response = requests.request("GET", url, headers=headers, data=payload)
-        data = response.json()
-        subscriptions = data.get("subscriptions", [])
-        for subscription in subscriptions:
-            states = subscription.get("states", [])
-            for state in states:
-                if state.get("state") == "Active":
-                    return subscription.get("iccid")
+        while True:
+            page = get_subscriptions_page(account_id, page_index, SNAPSHOT_PAGE_SIZE, eid)
+            subscriptions.extend(page)
+            if len(page) < SNAPSHOT_PAGE_SIZE:
+                return {"subscriptions": subscriptions}
+            page_index += 1
+
+    except ApiUnavailable:
+        raise
 
     except requests.RequestException as e:
         print(f"Error: {str(e)}")
@@ -39,6 +76,43 @@ def get_iccid_with_active_state(account_id, eid):
     return None
 
 
+@timed
+def get_eid_state(account_id, eid, snapshot=None):
+    """
+    Retrieves the state of every profile of the given account ID and EID.
+
+    Args:
+        account_id (str): The ID of the account.
+        eid (str): The EID to filter the subscriptions.
+        snapshot (dict, optional): A response from get_subscription_snapshot. Fetched when omitted.
+
+    Returns:
+        EidState: The profiles of the EID, with found=False if the request failed.
+
+    """
+    if snapshot is None:
+        snapshot = get_subscription_snapshot(account_id, eid)
+    return EidState.from_snapshot(eid, snapshot)
+
+
+@timed
+def get_iccid_with_active_state(account_id, eid, snapshot=None):
+    """
+    Retrieves the ICCID of the subscription with an active state for the given account ID and EID.
+
+    Args:
+        account_id (str): The ID of the account.
+        eid (str): The EID to filter the subscriptions.
+        snapshot (dict, optional): A response from get_subscription_snapshot. Fetched when omitted.
+
+    Returns:
+        str or None: The ICCID of the subscription with an active state, or None if not found.
+
+    """
+    return get_eid_state(account_id, eid, snapshot).active_iccid
+
+
+@timed
 def check_request_status(account_id, request_id):
     """
     Retrieves the status of a switch request for an eSIM profile from the Kore Wireless API.
@@ -60,27 +134,29 @@ def check_request_status(account_id, request_id):
 
     """
 
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/esim-profile-switch-requests/{request_id}"
+    url = f"{api_base_url}/accounts/{account_id}/esim-profile-switch-requests/{request_id}"
     payload = {}
     headers = api_headers
 
-    response = requests.request("GET", url, headers=headers, data=payload)
+    response = api_request("GET", url, headers=headers, data=payload, auth=token_manager)
     response_json = response.json()
     request_status = response_json.get("switch-request-status")
     return request_status
 
 
-def check_verizon(account_id, eid):
+@timed
+def check_verizon(account_id, eid, snapshot=None):
     """
     Checks the Verizon subscription status for a given account ID and EID.
 
-    This function sends a GET request to the Kore Wireless API, retrieves the subscription
-    information for the given account ID and EID, and checks whether there is an 'OmniSIM
-    KVZW Downloadable' product offer with a 'Ready' state.
+    This function retrieves the subscription information for the given account ID and EID
+    (or uses the provided snapshot), and checks whether there is an 'OmniSIM KVZW Downloadable'
+    product offer with a 'Ready' state.
 
     Args:
         account_id (str): The account ID to check the subscription for.
         eid (str): The EID to check the subscription for.
+        snapshot (dict, optional): A response from get_subscription_snapshot. Fetched when omitted.
 
     Returns:
         tuple: A tuple (bool, str) where:
@@ -88,46 +164,23 @@ def check_verizon(account_id, eid):
               with a 'Ready' state, False if not, and None if there was an exception during the request.
             - The str is the 'subscription-id' of the 'OmniSIM KVZW Downloadable' product offer
               with a 'Ready' state if such exists, '' otherwise.
-
-    Raises:
-        requests.RequestException: If there was a problem with the GET request.
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/subscriptions?page-index=0&max-page-item=10&imsi=&iccid=&eid={eid}&sim-state=&msisdn="
-    payload = {}
-    headers = api_headers
-
-    try:
-        response = requests.request("GET", url, headers=headers, data=payload)
-        data = response.json()
+    return get_eid_state(account_id, eid, snapshot).check_ready(VZW_PRODUCT)
 
-        for subscription in data.get('subscriptions', []):
-            product_offer = subscription.get('product-offer', '')
-            states = subscription.get('states', [])
 
-            if product_offer == 'OmniSIM KVZW Downloadable':
-                for state in states:
-                    if state.get('state', '') == 'Ready':
-                        return (True, subscription.get('subscription-id', ''))
-            else:
-                return (False, '')
-
-    except requests.RequestException as e:
-        print(f"Error: {str(e)}")
-
-    return (None, '')
-
-
-def check_att(account_id, eid):
+@timed
+def check_att(account_id, eid, snapshot=None):
     """
     Checks the ATT subscription status for a given account ID and EID.
 
-    This function sends a GET request to the Kore Wireless API, retrieves the subscription
-    information for the given account ID and EID, and checks whether there is an 'OmniSIM KATTCC Downloadable'
+    This function retrieves the subscription information for the given account ID and EID
+    (or uses the provided snapshot), and checks whether there is an 'OmniSIM KATTCC Downloadable'
     product offer with a 'Ready' state.
 
     Args:
         account_id (str): The account ID to check the subscription for.
         eid (str): The EID to check the subscription for.
+        snapshot (dict, optional): A response from get_subscription_snapshot. Fetched when omitted.
 
     Returns:
         tuple: A tuple (bool, str) where:
@@ -135,111 +188,95 @@ def check_att(account_id, eid):
               with a 'Ready' state, False if not, and None if there was an exception during the request.
             - The str is the 'subscription-id' of the 'OmniSIM KATTCC Downloadable' product offer
               with a 'Ready' state if such exists, '' otherwise.
+    """
+    return get_eid_state(account_id, eid, snapshot).check_ready(ATT_PRODUCT)
+
+
+@timed
+def check_provisioning_request_status(account_id, provisioning_request_id):
+    """
+    Checks the status of a provisioning request for a given account ID and provisioning request ID.
+
+    This function sends a GET request to the Kore Wireless API and retrieves the completion status
+    of the first subscription of the provisioning request. Use get_provisioning_request_statuses
+    for provisioning requests covering several subscriptions.
+
+    Args:
+        account_id (str): The account ID of the provisioning request to check.
+        provisioning_request_id (str): The provisioning request ID to check.
+
+    Returns:
+        str: The status of the provisioning request if the request was successful, '' otherwise.
 
     Raises:
         requests.RequestException: If there was a problem with the GET request.
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/subscriptions?page-index=0&max-page-item=10&imsi=&iccid=&eid={eid}&sim-state=&msisdn="
-    payload = {}
+    url = f"{api_base_url}/accounts/{account_id}/provisioning-requests/{provisioning_request_id}"
     headers = api_headers
 
     try:
-        response = requests.request("GET", url, headers=headers, data=payload)
+        response = api_request("GET", url, headers=headers, auth=token_manager)
         data = response.json()
+        completion_status = data['Deactivation']['subscriptions'][0]['completion-status']
+        return completion_status
 
-        for subscription in data.get('subscriptions', []):
-            product_offer = subscription.get('product-offer', '')
-            states = subscription.get('states', [])
 
-            if product_offer == 'OmniSIM KATTCC Downloadable':
-                for state in states:
-                    if state.get('state', '') == 'Ready':
-                        return (True, subscription.get('subscription-id', ''))
-            else:
-                return (False, '')
+    except ApiUnavailable:
+        raise
 
     except requests.RequestException as e:
         print(f"Error: {str(e)}")
-
-    return (None, '')
+        return ''
 
 
-def check_provisioning_request_status(account_id, provisioning_request_id):
+@timed
+def get_provisioning_request_statuses(account_id, provisioning_request_id):
     """
-    Checks the status of a provisioning request for a given account ID and provisioning request ID.
-
-    This function sends a GET request to the Kore Wireless API and retrieves the status of
-    the provisioning request. It will keep polling the API until the "Deactivation" key
-    is present in the response or the timeout is reached.
+    Retrieves the completion status of every subscription of a provisioning request.
 
     Args:
         account_id (str): The account ID of the provisioning request to check.
         provisioning_request_id (str): The provisioning request ID to check.
 
     Returns:
-        str: The status of the provisioning request if the request was successful, '' otherwise.
-
-    Raises:
-        requests.RequestException: If there was a problem with the GET request.
+        dict[str, str]: The completion status keyed by subscription ID, or an empty dict if the
+                        request failed or the response does not list the subscriptions yet.
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/provisioning-requests/{provisioning_request_id}"
+    url = f"{api_base_url}/accounts/{account_id}/provisioning-requests/{provisioning_request_id}"
     headers = api_headers
 
     try:
-        response = requests.request("GET", url, headers=headers)
+        response = api_request("GET", url, headers=headers, auth=token_manager)
         data = response.json()
-        completion_status = data['Deactivation']['subscriptions'][0]['completion-status']
-        return completion_status
+        subscriptions = data.get('Deactivation', {}).get('subscriptions', [])
+        return {subscription.get('subscription-id'): subscription.get('completion-status', '')
+                for subscription in subscriptions}
 
+    except ApiUnavailable:
+        raise
 
     except requests.RequestException as e:
         print(f"Error: {str(e)}")
-        return ''
+        return {}
 
 
-def get_eid_information(account_id, eid):
+@timed
+def get_eid_information(account_id, eid, snapshot=None):
     """Retrieves the profile information for the given account ID and EID.
 
-    This function sends a GET request to the KORE Wireless API to retrieve the subscription details
-    for a specific account ID and EID. It parses the JSON response and extracts the service type and state
-    for each profile associated with the given EID, returning them as a list of tuples.
+    This function retrieves the subscription details for a specific account ID and EID (or uses
+    the provided snapshot). It extracts the service type and state for each profile associated
+    with the given EID, returning them as a list of tuples.
 
     Args:
         account_id (str): The ID of the account for which to retrieve subscription details.
         eid (str): The EID for which to retrieve subscription details.
+        snapshot (dict, optional): A response from get_subscription_snapshot. Fetched when omitted.
 
     Returns:
         list[tuple[str, str]]: A list of tuples where each tuple represents a profile associated with the
                                given EID and contains two strings: the service type and the state of the profile.
-                               Returns an empty list if no profiles are found.
-
-    Raises:
-        requests.RequestException: If an error occurs while making the API request. The exception is logged
-                                  and the function returns None.
+                               Returns an empty list if no profiles are found, and None if the request failed.
 
     """
-
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/subscriptions?page-index=0&max-page-item=10&imsi=&iccid=&eid={eid}&sim-state=&msisdn="
-    payload = {}
-    headers = api_headers
-    profiles = []
-    state = ''
-
-    try:
-        response = requests.request("GET", url, headers=headers, data=payload)
-        data = response.json()
-        subscriptions = data.get('subscriptions', [])
-        for subscription in subscriptions:
-            service_type_id = subscription.get('service-type-id')
-            for i in subscription['states']:
-                if i.get('is-current'):
-                    state = i.get('state')
-            service_type = SVCTOPROD.get(service_type_id)
-            profile_details = (service_type, state)
-            profiles.append(profile_details)
-        return profiles
-
-    except requests.RequestException as e:
-        print(f"Error: {str(e)}")
-
-    return None
+    return get_eid_state(account_id, eid, snapshot).profile_states()
@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+import time
+
+
+HISTORY_DB = 'history.db'
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    carrier TEXT,
+    eid TEXT NOT NULL,
+    request_id TEXT,
+    profile TEXT,
+    status TEXT,
+    elapsed_time REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS operations_eid ON operations (eid);
+CREATE INDEX IF NOT EXISTS operations_carrier ON operations (carrier, created_at);
+CREATE INDEX IF NOT EXISTS operations_status ON operations (status);
+CREATE INDEX IF NOT EXISTS operations_created_at ON operations (created_at);
+"""
+
+
+def split_job_name(name):
+    """
+    Splits a job name into its operation and carrier.
+
+    Args:
+        name (str): The job name, e.g. 'download_vzw' or 'query_eid'.
+
+    Returns:
+        tuple[str, str or None]: The operation and the carrier, e.g. ('download', 'vzw'), or
+                                 (name, None) for operations that are not carrier specific.
+    """
+    operation, _, carrier = name.rpartition('_')
+    if operation in ('download', 'terminate') and carrier in ('vzw', 'att'):
+        return operation, carrier
+    return name, None
+
+
+def percentile(values, pct):
+    """
+    Returns the nearest-rank percentile of a sorted list of values.
+
+    Args:
+        values (list[float]): The values, sorted in ascending order.
+        pct (float): The percentile, between 0 and 100.
+
+    Returns:
+        float or None: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    rank = max(int(-(-pct * len(values) // 100)), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+class OperationHistory:
+    """
+    Persists every download, terminate and query result to a local SQLite database.
+
+    The database runs in WAL mode, so the job worker threads can write while the history is
+    being queried. Each thread uses its own connection.
+
+    Args:
+        path (str): The path of the SQLite database file.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        with self._schema_lock:
+            if not self._schema_ready:
+                connection.executescript(SCHEMA)
+                self._schema_ready = True
+        return connection
+
+    def record(self, job_id, name, rows):
+        """
+        Stores the results.csv rows of one EID.
+
+        A failure to write the history is printed and does not affect the job.
+
+        Args:
+            job_id (str): The ID of the job that produced the rows.
+            name (str): The job name, e.g. 'download_vzw'.
+            rows (list[dict]): The results.csv rows of the EID. A row with 'operation' and
+                               'carrier' columns (see the swap workflows) overrides the
+                               operation and carrier of the job name.
+        """
+        if not rows:
+            return
+        operation, carrier = split_job_name(name)
+        now = time.time()
+        values = [(job_id, row.get('operation', operation), row.get('carrier', carrier), row.get('eid', ''), row.get('request_id'), row.get('profile'),
+                   row.get('status', row.get('state')), row.get('elapsed_time'), now)
+                  for row in rows]
+        try:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT INTO operations (job_id, operation, carrier, eid, request_id, profile, status, "
+                    "elapsed_time, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+
+        except sqlite3.Error as e:
+            print(f"Error: {str(e)}")
+
+    def eid_history(self, eid, limit=100):
+        """
+        Returns the most recent operations of an EID.
+
+        Args:
+            eid (str): The EID.
+            limit (int): The maximum number of operations returned.
+
+        Returns:
+            list[dict]: The operations, newest first.
+        """
+        cursor = self._connection().execute(
+            "SELECT job_id, operation, carrier, eid, request_id, profile, status, elapsed_time, created_at "
+            "FROM operations WHERE eid = ? ORDER BY created_at DESC LIMIT ?", (eid, limit))
+        return [dict(row) for row in cursor]
+
+    def switch_time_percentiles(self, carrier=None, operation='download', days=30,
+                                percentiles=DEFAULT_PERCENTILES):
+        """
+        Returns percentile switch times of completed operations per carrier and day (UTC).
+
+        Args:
+            carrier (str, optional): 'vzw' or 'att'. All carriers when omitted.
+            operation (str): 'download' or 'terminate'.
+            days (int): The number of days of history to include, counting back from now.
+            percentiles (tuple[float]): The percentiles to compute.
+
+        Returns:
+            list[dict]: One entry per carrier and day with the 'carrier', 'day', the number of
+                        'completed' and 'failed' operations, and a 'p<N>' elapsed time in seconds
+                        for each percentile.
+        """
+        query = ("SELECT carrier, date(created_at, 'unixepoch') AS day, LOWER(status) AS status, elapsed_time "
+                 "FROM operations WHERE operation = ? AND created_at >= ? AND carrier IS NOT NULL")
+        params = [operation, time.time() - days * 86400]
+        if carrier:
+            query += " AND carrier = ?"
+            params.append(carrier)
+        query += " ORDER BY carrier, day, elapsed_time"
+
+        groups = {}
+        for row in self._connection().execute(query, params):
+            group = groups.setdefault((row['carrier'], row['day']), {'times': [], 'failed': 0})
+            if row['status'] == 'completed' and row['elapsed_time'] is not None:
+                group['times'].append(row['elapsed_time'])
+            else:
+                group['failed'] += 1
+
+        summary = []
+        for (group_carrier, day), group in groups.items():
+            entry = {'carrier': group_carrier, 'day': day,
+                     'completed': len(group['times']), 'failed': group['failed']}
+            for pct in percentiles:
+                entry[f'p{pct:g}'] = percentile(group['times'], pct)
+            summary.append(entry)
+        return summary
+
+
+history = OperationHistory()
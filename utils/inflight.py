@@ -0,0 +1,150 @@
+import functools
+import threading
+from concurrent.futures import Future
+
+
+class InFlight:
+    """
+    Tracks the operations in progress, keyed by (operation, account_id, eid), so that a duplicate
+    of an operation that is already running attaches to it instead of calling the API again.
+
+    The first caller for a key owns the operation and runs it; every caller for the same key
+    while it runs waits for the owner and gets the same result (or exception). The key is
+    released as soon as the operation finishes, so a later submission runs it again.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """
+        Args:
+            key (tuple): The (operation, account_id, eid) of the operation.
+
+        Returns:
+            tuple[Future, bool]: The future of the operation, and whether the caller owns it and
+                                 has to run it and call finish.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = self._futures[key] = Future()
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        """
+        Releases an owned key and passes the result or exception to the waiting duplicates.
+
+        Args:
+            key (tuple): The key passed to claim.
+            future (Future): The future returned by claim.
+            result: The result of the operation.
+            error (BaseException, optional): The exception raised by the operation.
+        """
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run(self, key, func):
+        """
+        Runs func unless the same operation is in flight, in which case its result is shared.
+
+        Args:
+            key (tuple): The (operation, account_id, eid) of the operation.
+            func (callable): Called without arguments to run the operation.
+
+        Returns:
+            The result of func, or of the operation in flight.
+        """
+        future, owner = self.claim(key)
+        if not owner:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def run_many(self, keys, func, on_result=None):
+        """
+        Runs a multi-EID operation for the keys that are not in flight yet, once per distinct key.
+
+        Args:
+            keys (list[tuple]): The (operation, account_id, eid) of each item.
+            func (callable): Called as func(indexes, done) with the indexes of the items to run.
+                             It may call done(index, result) as soon as the result of one of them
+                             is known, and returns the results of all of them in the same order.
+            on_result (callable, optional): Called as on_result(index, result) for every item,
+                                            duplicates included, as soon as its result is known.
+                                            Items in flight elsewhere are reported once func
+                                            returns.
+
+        Returns:
+            list: The result of each item, in input order. Duplicate items share a result.
+        """
+        futures = {}
+        duplicates = {}
+        owned = []
+        for index, key in enumerate(keys):
+            duplicates.setdefault(key, []).append(index)
+            if key not in futures:
+                futures[key], owner = self.claim(key)
+                if owner:
+                    owned.append(index)
+
+        def done(index, result):
+            key = keys[index]
+            if futures[key].done():
+                return
+            self.finish(key, futures[key], result)
+            if on_result is not None:
+                for duplicate in duplicates[key]:
+                    on_result(duplicate, result)
+
+        try:
+            results = func(owned, done)
+        except BaseException as e:
+            for index in owned:
+                if not futures[keys[index]].done():
+                    self.finish(keys[index], futures[keys[index]], error=e)
+            raise
+        for index, result in zip(owned, results):
+            done(index, result)
+        if on_result is not None:
+            owned_keys = {keys[index] for index in owned}
+            for key, future in futures.items():
+                if key not in owned_keys:
+                    for duplicate in duplicates[key]:
+                        on_result(duplicate, future.result())
+        return [futures[key].result() for key in keys]
+
+
+inflight = InFlight()
+
+
+def single_flight(operation):
+    """
+    Decorator making a per-EID workflow, called as workflow(account_id, eid, ...), share its
+    result with concurrent calls of the same operation on the same EID (see InFlight).
+
+    Args:
+        operation (str): The name of the operation, e.g. 'download_vzw'.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(workflow):
+        @functools.wraps(workflow)
+        def wrapper(account_id, eid, *args, **kwargs):
+            return inflight.run((operation, account_id, eid),
+                                lambda: workflow(account_id, eid, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -1,4 +1,5 @@
-import requests
+from utils.client import api_request
+from utils.metrics import timed
 
 
 SVCTOPROD = {
@@ -23,17 +24,22 @@ def compare_values(active_iccid,bs_iccid):
     return active_iccid == bs_iccid
 
 
-def get_access_token(token_url,client_id,client_secret_key):
+DEFAULT_TOKEN_LIFETIME = 3600
+
+
+@timed
+def request_access_token(token_url, client_id, client_secret_key):
     """
-    Retrieves an access token using client credentials from the given token URL.
+    Requests an access token and its lifetime using client credentials from the given token URL.
 
     Args:
-        client_id (str): The client ID for authentication.
-        client_secret (str): The client secret for authentication.
         token_url (str): The URL to request the access token.
+        client_id (str): The client ID for authentication.
+        client_secret_key (str): The client secret for authentication.
 
     Returns:
-        str: The retrieved access token.
+        tuple[str, float] or None: The access token and the number of seconds it is valid for,
+                                   or None if the token request failed.
 
     Raises:
         requests.exceptions.RequestException: If the token request fails.
@@ -52,11 +58,36 @@ def get_access_token(token_url,client_id,client_secret_key):
         "client_secret": client_secret_key
     }
 
-    response = requests.post(url, headers=headers, data=data)
+    response = api_request("POST", url, headers=headers, data=data)
 
     if response.status_code == 200:
-        access_token = response.json()["access_token"]
-        return access_token
+        response_json = response.json()
+        access_token = response_json["access_token"]
+        expires_in = float(response_json.get("expires_in", DEFAULT_TOKEN_LIFETIME))
+        return access_token, expires_in
     else:
         print("Token request failed with status code:", response.status_code)
         return None
+
+
+@timed
+def get_access_token(token_url,client_id,client_secret_key):
+    """
+    Retrieves an access token using client credentials from the given token URL.
+
+    Args:
+        client_id (str): The client ID for authentication.
+        client_secret (str): The client secret for authentication.
+        token_url (str): The URL to request the access token.
+
+    Returns:
+        str: The retrieved access token.
+
+    Raises:
+        requests.exceptions.RequestException: If the token request fails.
+
+    """
+    token = request_access_token(token_url, client_id, client_secret_key)
+    if token is None:
+        return None
+    return token[0]
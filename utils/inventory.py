@@ -0,0 +1,94 @@
+import threading
+import time
+from utils.get_functions import get_subscriptions_page
+
+
+INVENTORY_PAGE_SIZE = 1000
+
+
+class SubscriptionInventory:
+    """
+    An in-memory index of every subscription of an account, keyed by EID and by ICCID.
+
+    The account's subscription list is paged through once with large pages, on first use, and
+    every lookup after that is served from memory. A batch of N EIDs therefore costs one request
+    per INVENTORY_PAGE_SIZE subscriptions instead of one request per EID. The inventory is a
+    point-in-time copy: create one per batch so that each batch starts from fresh data.
+
+    Args:
+        account_id (str): The ID of the account.
+        page_size (int): The number of subscriptions requested per page.
+    """
+
+    def __init__(self, account_id, page_size=INVENTORY_PAGE_SIZE):
+        self.account_id = account_id
+        self.page_size = page_size
+        self.synced_at = None
+        self._by_eid = {}
+        self._by_iccid = {}
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Pages through all subscriptions of the account and rebuilds the EID and ICCID indexes.
+
+        Raises:
+            requests.RequestException: If an error occurs while requesting a page. The previous
+                                       indexes are kept.
+        """
+        by_eid = {}
+        by_iccid = {}
+        page_index = 0
+        while True:
+            page = get_subscriptions_page(self.account_id, page_index, self.page_size)
+            for subscription in page:
+                by_eid.setdefault(subscription.get('eid'), []).append(subscription)
+                if subscription.get('iccid'):
+                    by_iccid[subscription['iccid']] = subscription
+            if len(page) < self.page_size:
+                break
+            page_index += 1
+
+        self._by_eid = by_eid
+        self._by_iccid = by_iccid
+        self.synced_at = time.time()
+
+    def _ensure_synced(self):
+        if self.synced_at is not None:
+            return
+        with self._lock:
+            if self.synced_at is None:
+                self.sync()
+
+    def snapshot(self, eid):
+        """
+        Returns the subscriptions of an EID, syncing the inventory first if it was never synced.
+
+        Args:
+            eid (str): The EID.
+
+        Returns:
+            dict: A snapshot shaped like the response of get_subscription_snapshot, for use with
+                  EidState.from_snapshot (see utils.eid_state). An unknown EID has no subscriptions.
+
+        Raises:
+            requests.RequestException: If the inventory could not be synced.
+        """
+        self._ensure_synced()
+        return {'subscriptions': list(self._by_eid.get(eid, []))}
+
+    def subscription_by_iccid(self, iccid):
+        """
+        Returns the subscription with the given ICCID, syncing the inventory first if needed.
+
+        Args:
+            iccid (str): The ICCID.
+
+        Returns:
+            dict or None: The subscription, or None if the account has no such ICCID.
+
+        Raises:
+            requests.RequestException: If the inventory could not be synced.
+        """
+        self._ensure_synced()
+        return self._by_iccid.get(iccid)
@@ -0,0 +1,318 @@
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from utils.workflows import error_message
+
+
+JOB_WORKERS = 2
+MAX_FINISHED_JOBS = 100
+EVENT_BACKLOG = 100
+KEEPALIVE_INTERVAL = 15
+
+FAILED_STATUSES = ("failed", "timed_out")
+
+
+class Job:
+    """
+    A batch submitted for background processing, with its progress.
+
+    Each EID result is published as an event to the job's subscribers as soon as it is recorded
+    instead of being kept for the lifetime of the job. Only the last EVENT_BACKLOG events are
+    kept, so that a subscriber connecting late still sees the most recent results.
+
+    Args:
+        name (str): The operation of the job, e.g. 'download_vzw'.
+        total (int or None): The number of EIDs in the job, or None until it is known.
+        job_id (str, optional): The ID of the job, e.g. of an earlier run being resumed. A new ID
+                                is generated when omitted.
+    """
+
+    def __init__(self, name, total, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.name = name
+        self.total = total
+        self.status = 'queued'
+        self.done = 0
+        self.failed = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._backlog = deque(maxlen=EVENT_BACKLOG)
+        self._subscribers = []
+        self._ended = False
+
+    def _counts(self):
+        return {
+            'done': self.done,
+            'failed': self.failed,
+            'pending': self.total - self.done - self.failed if self.total is not None else None
+        }
+
+    def _publish(self, event):
+        self._backlog.append(event)
+        for subscriber in self._subscribers:
+            subscriber.put(event)
+
+    def record(self, eid, messages, rows, failed=False):
+        """
+        Records the result of one EID and publishes it to the job's subscribers.
+
+        An EID counts as failed if its workflow raised (failed=True) or if one of its results.csv
+        rows has a "failed" or "timed_out" status.
+
+        Args:
+            eid (str): The EID.
+            messages (list[str]): The result messages of the EID.
+            rows (list[dict]): The results.csv rows of the EID.
+            failed (bool): Whether the workflow of the EID raised an exception.
+        """
+        failed = failed or any(str(row.get('status', '')).lower() in FAILED_STATUSES for row in rows)
+        elapsed_times = [row['elapsed_time'] for row in rows if 'elapsed_time' in row]
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.done += 1
+            event = dict(self._counts(), type='result', eid=eid, messages=messages,
+                         outcome='failed' if failed else 'done',
+                         elapsed_time=elapsed_times[0] if elapsed_times else None)
+            self._publish(event)
+
+    def end(self):
+        """
+        Publishes the final status of the job to its subscribers and closes their streams.
+        """
+        with self._lock:
+            self._ended = True
+            self._publish(dict(self._counts(), type='end', status=self.status, error=self.error))
+            self._subscribers = []
+
+    def events(self):
+        """
+        Yields the job's events: the backlog of recent results first, then every new result as it
+        is recorded, until the job ends. None is yielded every KEEPALIVE_INTERVAL seconds without
+        events so that the caller can keep the connection alive.
+
+        Yields:
+            dict or None: A 'result' or 'end' event, or None.
+        """
+        subscriber = queue.Queue()
+        with self._lock:
+            backlog = list(self._backlog)
+            ended = self._ended
+            if not ended:
+                self._subscribers.append(subscriber)
+
+        for event in backlog:
+            yield event
+        if ended:
+            return
+
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield None
+                    continue
+                yield event
+                if event['type'] == 'end':
+                    return
+        finally:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+    def set_total(self, total):
+        """
+        Sets the number of EIDs of the job once it is known, e.g. after counting the rows of its
+        file, so that the pending count is right while the rows are still being dispatched.
+
+        Args:
+            total (int): The number of EIDs in the job.
+        """
+        with self._lock:
+            self.total = total
+
+    def start_count(self, count):
+        """
+        Counts the EIDs of the job on a thread of its own while its rows are already being
+        dispatched, and sets the total once they are counted. Until then the total and the
+        pending count are None.
+
+        Args:
+            count (callable): Called without arguments, returns the number of EIDs in the job.
+
+        Returns:
+            threading.Thread: The counting thread, to be joined before the job ends.
+        """
+        def run():
+            try:
+                self.set_total(count())
+            except Exception as e:
+                print(f"Error: {str(e)}")
+
+        with self._lock:
+            self.total = None
+        thread = threading.Thread(target=run, name=f'job-count-{self.id}', daemon=True)
+        thread.start()
+        return thread
+
+    def count(self, items):
+        """
+        Yields the given items, adding each one to the job's total as it is read.
+
+        Used when the items are parsed from a file while the job is already running, so that the
+        total is not known up front.
+
+        Args:
+            items (iterable): The items of the job.
+
+        Yields:
+            The next item.
+        """
+        for item in items:
+            with self._lock:
+                self.total += 1
+            yield item
+
+    def track(self, worker):
+        """
+        Wraps a per-EID workflow so that every result it returns or exception it raises is recorded.
+
+        Args:
+            worker (callable): A workflow returning (messages, rows).
+
+        Returns:
+            callable: The wrapped workflow, for use with utils.batch.run_batch.
+        """
+        def tracked(*item):
+            try:
+                messages, rows = worker(*item)
+            except Exception as e:
+                self.record(item[1], [error_message(item[1], e)], [], failed=True)
+                raise
+            self.record(item[1], messages, rows)
+            return messages, rows
+        return tracked
+
+    def progress(self):
+        """
+        Returns:
+            dict: The job ID, name, status and done/failed/pending counts.
+        """
+        with self._lock:
+            return dict(self._counts(), job_id=self.id, name=self.name, status=self.status,
+                        total=self.total, error=self.error)
+
+
+class JobManager:
+    """
+    Runs submitted jobs on a fixed number of background worker threads.
+
+    Args:
+        workers (int): The number of jobs processed at the same time.
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _execute(self, job, run):
+        job.status = 'running'
+        try:
+            run(job)
+            job.status = 'finished'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'error'
+        finally:
+            job.finished_at = time.time()
+            job.end()
+            self._prune()
+
+    def _work(self):
+        while True:
+            job, run = self._queue.get()
+            try:
+                self._execute(job, run)
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.finished_at is not None]
+            finished.sort(key=lambda job: job.finished_at)
+            for job in finished[:-MAX_FINISHED_JOBS]:
+                del self._jobs[job.id]
+
+    def submit(self, name, total, run, job_id=None):
+        """
+        Queues a job for background processing and returns immediately.
+
+        Args:
+            name (str): The operation of the job, e.g. 'download_vzw'.
+            total (int or None): The number of EIDs in the job, 0 if run counts them with Job.count,
+                                 or None if run counts them with Job.start_count.
+            run (callable): Called as run(job) on a worker thread.
+            job_id (str, optional): The ID of an earlier run of the job being resumed.
+
+        Returns:
+            Job or None: The queued job, or None if a job with job_id is still queued or running.
+        """
+        self._start()
+        job = Job(name, total, job_id)
+        with self._lock:
+            running = self._jobs.get(job.id)
+            if running is not None and running.finished_at is None:
+                return None
+            self._jobs[job.id] = job
+        self._queue.put((job, run))
+        return job
+
+    def run(self, name, total, run):
+        """
+        Registers a job and runs it on the calling thread, e.g. for a single-EID form submission.
+
+        Args:
+            name (str): The operation of the job, e.g. 'download_vzw'.
+            total (int): The number of EIDs in the job.
+            run (callable): Called as run(job).
+
+        Returns:
+            Job: The finished job.
+        """
+        job = Job(name, total)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._execute(job, run)
+        return job
+
+    def get(self, job_id):
+        """
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            Job or None: The job, or None if it is unknown or was pruned.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+jobs = JobManager()
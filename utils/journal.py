@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+
+
+JOURNAL_FOLDER = 'journals'
+FINISHED_STAGES = ('completed', 'failed')
+
+
+def journal_path(job_id, folder=JOURNAL_FOLDER):
+    """
+    Returns the path of the journal of a job.
+
+    Args:
+        job_id (str): The ID of the job.
+        folder (str): The directory holding the journals.
+
+    Returns:
+        str: The path of the job's journal file.
+    """
+    return os.path.join(folder, f"{job_id}.jsonl")
+
+
+class Journal:
+    """
+    Records the stage of every EID of a job in an append-only JSON lines file.
+
+    An EID goes through 'checked' (its checks passed), 'submitted' (a request was sent, with
+    its request ID), 'confirmed' (the request finished, with its status) and finally 'completed'
+    or 'failed' once its results are written. 'submitted' and 'confirmed' are recorded per step,
+    e.g. 'terminate' and 'download' for a carrier swap.
+
+    Every entry is flushed and synced to disk before record returns, and opening an existing
+    journal replays it, so a job restarted after the process died skips its finished EIDs and
+    re-attaches to the requests already submitted instead of submitting them again.
+
+    Args:
+        path (str): The path of the journal file.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.meta = None
+        self._stages = {}
+        self._steps = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._replay()
+        self._file = open(path, 'a')
+
+    def _replay(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry):
+        if entry.get('type') == 'job':
+            self.meta = entry
+            return
+        eid = entry.get('eid')
+        self._stages[eid] = entry.get('stage')
+        step = entry.get('step')
+        if step:
+            self._steps.setdefault((eid, step), {}).update(entry)
+
+    def _append(self, entry):
+        with self._lock:
+            self._apply(entry)
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def start(self, **meta):
+        """
+        Records what is needed to restart the job, unless the journal already holds it.
+
+        Args:
+            **meta: JSON-serializable job settings, e.g. name and csv_path.
+        """
+        if self.meta is None:
+            self._append(dict(meta, type='job', time=time.time()))
+
+    def record(self, eid, stage, **fields):
+        """
+        Records that an EID reached a stage.
+
+        Args:
+            eid (str): The EID.
+            stage (str): 'checked', 'submitted', 'confirmed', 'completed' or 'failed'.
+            **fields: JSON-serializable details, e.g. step and request_id.
+        """
+        self._append(dict(fields, type='eid', eid=eid, stage=stage, time=time.time()))
+
+    def finish(self, eid, rows):
+        """
+        Records that the results of an EID were written, as 'completed' if every results.csv row
+        of the EID completed and as 'failed' otherwise.
+
+        Args:
+            eid (str): The EID.
+            rows (list[dict]): The results.csv rows of the EID.
+        """
+        completed = bool(rows) and all(str(row.get('status', '')).lower() == 'completed' for row in rows)
+        self.record(eid, 'completed' if completed else 'failed')
+
+    def finished(self, eid):
+        """
+        Returns:
+            bool: Whether the results of the EID were written by an earlier run of the job.
+        """
+        with self._lock:
+            return self._stages.get(eid) in FINISHED_STAGES
+
+    def finished_eids(self):
+        """
+        Returns:
+            set[str]: The EIDs whose results were written by an earlier run of the job.
+        """
+        with self._lock:
+            return {eid for eid, stage in self._stages.items() if stage in FINISHED_STAGES}
+
+    def step(self, eid, step):
+        """
+        Args:
+            eid (str): The EID.
+            step (str): The step, e.g. 'download'.
+
+        Returns:
+            dict or None: The request_id and submitted_at of the step if it was submitted, with
+                          status and elapsed_time once it was confirmed, or None.
+        """
+        with self._lock:
+            entry = self._steps.get((eid, step))
+            return dict(entry) if entry is not None else None
+
+    def close(self):
+        """
+        Closes the journal file.
+        """
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
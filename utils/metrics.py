@@ -0,0 +1,168 @@
+import contextvars
+import functools
+import threading
+import time
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+POLL_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_current_function = contextvars.ContextVar('current_function', default='other')
+
+
+class Histogram:
+    """
+    A cumulative histogram in the Prometheus layout: a count per upper bound, a sum and a count.
+
+    Args:
+        buckets (tuple[float]): The upper bounds of the buckets, in ascending order.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:g}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class Metrics:
+    """
+    Collects API call latencies, HTTP status counts and poll counts in memory, and renders them
+    in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._errors = {}
+        self._statuses = {}
+        self._polls = {}
+
+    def observe_call(self, function, seconds, error=False):
+        """
+        Records the duration of one call of an API function.
+
+        Args:
+            function (str): The name of the function.
+            seconds (float): The duration of the call.
+            error (bool): Whether the call raised an exception.
+        """
+        with self._lock:
+            histogram = self._latency.get(function)
+            if histogram is None:
+                histogram = self._latency[function] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            if error:
+                self._errors[function] = self._errors.get(function, 0) + 1
+
+    def count_status(self, function, status_code):
+        """
+        Counts one HTTP response of an API function.
+
+        Args:
+            function (str): The name of the function that sent the request.
+            status_code (int): The HTTP status of the response.
+        """
+        key = (function, str(status_code))
+        with self._lock:
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def observe_polls(self, kind, polls):
+        """
+        Records the number of polls it took for one request to finish.
+
+        Args:
+            kind (str): The kind of request polled, 'switch' or 'provisioning'.
+            polls (int): The number of polls made.
+        """
+        with self._lock:
+            histogram = self._polls.get(kind)
+            if histogram is None:
+                histogram = self._polls[kind] = Histogram(POLL_BUCKETS)
+            histogram.observe(polls)
+
+    def render(self):
+        """
+        Returns:
+            str: All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            lines.append('# HELP kore_api_call_seconds Duration of Kore Wireless API function calls.')
+            lines.append('# TYPE kore_api_call_seconds histogram')
+            for function, histogram in sorted(self._latency.items()):
+                lines.extend(histogram.render('kore_api_call_seconds', f'function="{function}"'))
+
+            lines.append('# HELP kore_api_call_errors_total API function calls that raised an exception.')
+            lines.append('# TYPE kore_api_call_errors_total counter')
+            for function, count in sorted(self._errors.items()):
+                lines.append(f'kore_api_call_errors_total{{function="{function}"}} {count}')
+
+            lines.append('# HELP kore_api_responses_total HTTP responses by API function and status code.')
+            lines.append('# TYPE kore_api_responses_total counter')
+            for (function, status), count in sorted(self._statuses.items()):
+                lines.append(f'kore_api_responses_total{{function="{function}",status="{status}"}} {count}')
+
+            lines.append('# HELP kore_polls_per_request Polls made until a request finished or timed out.')
+            lines.append('# TYPE kore_polls_per_request histogram')
+            for kind, histogram in sorted(self._polls.items()):
+                lines.extend(histogram.render('kore_polls_per_request', f'kind="{kind}"'))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def timed(func):
+    """
+    Decorator recording the latency of every call of an API function, and the HTTP status of
+    every response received during the call (see count_response).
+
+    Args:
+        func (callable): The function to time.
+
+    Returns:
+        callable: The wrapped function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_function.set(func.__name__)
+        start_time = time.perf_counter()
+        error = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.observe_call(func.__name__, time.perf_counter() - start_time, error)
+            _current_function.reset(token)
+    return wrapper
+
+
+def count_response(r, *args, **kwargs):
+    """
+    requests response hook counting the HTTP status of a response against the innermost timed
+    function being called.
+
+    Returns:
+        requests.Response: The response, unchanged.
+    """
+    metrics.count_status(_current_function.get(), r.status_code)
+    return r
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from static.credentials import webhooks_enabled, webhook_secret
+
+
+EARLY_NOTIFICATIONS = 1000
+
+
+class Waiter:
+    """
+    Receives the completion notifications of one switch or provisioning request.
+
+    Attributes:
+        status (str or None): The notified status of the request as a whole.
+        statuses (dict[str, str]): The notified completion status keyed by subscription ID, for
+                                   provisioning requests.
+    """
+
+    def __init__(self, kind, request_id):
+        self.kind = kind
+        self.request_id = request_id
+        self.status = None
+        self.statuses = {}
+        self._event = threading.Event()
+
+    def notify(self, status=None, statuses=None):
+        if statuses:
+            self.statuses.update(statuses)
+        if status:
+            self.status = status
+        self._event.set()
+
+    def current_status(self):
+        """
+        Returns:
+            str or None: The notified status of the request, or else of its first notified
+                         subscription, as check_provisioning_request_status reports it.
+        """
+        if self.status:
+            return self.status
+        return next(iter(self.statuses.values()), None)
+
+    def wait(self, timeout):
+        """
+        Sleeps until a notification arrives or the timeout passes, whichever comes first.
+
+        Args:
+            timeout (float): The maximum number of seconds to sleep.
+        """
+        self._event.wait(timeout)
+        self._event.clear()
+
+
+class NotificationRegistry:
+    """
+    Hands completion notifications received on the webhook routes to the waiting workflows.
+
+    A workflow registers a waiter for its request ID once the request is submitted, and the
+    poll loops of utils.polling sleep on the waiter instead of time.sleep, so a notification
+    wakes them at once. A notification that arrives before its waiter is registered is kept
+    (up to max_early of them) and delivered on registration.
+
+    Args:
+        enabled (bool): Whether the Kore API is set up to send notifications to this app. The
+                        poll loops only rely on notifications when enabled.
+        max_early (int): The number of notifications kept for requests nobody waits for yet.
+    """
+
+    def __init__(self, enabled=False, max_early=EARLY_NOTIFICATIONS):
+        self.enabled = enabled
+        self.max_early = max_early
+        self._waiters = {}
+        self._early = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, kind, request_id):
+        """
+        Args:
+            kind (str): 'switch' or 'provisioning'.
+            request_id (str): The ID of the switch or provisioning request.
+
+        Returns:
+            Waiter: The waiter of the request. Release it with release once done.
+        """
+        waiter = Waiter(kind, request_id)
+        with self._lock:
+            self._waiters.setdefault((kind, request_id), []).append(waiter)
+            early = self._early.pop((kind, request_id), None)
+        if early is not None:
+            waiter.notify(*early)
+        return waiter
+
+    def release(self, waiter):
+        """
+        Stops delivering notifications to a waiter.
+
+        Args:
+            waiter (Waiter): A waiter returned by register.
+        """
+        key = (waiter.kind, waiter.request_id)
+        with self._lock:
+            waiters = self._waiters.get(key, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._waiters.pop(key, None)
+
+    def notify(self, kind, request_id, status=None, statuses=None):
+        """
+        Delivers a completion notification to the waiters of a request.
+
+        Args:
+            kind (str): 'switch' or 'provisioning'.
+            request_id (str): The ID of the switch or provisioning request.
+            status (str, optional): The status of the request as a whole.
+            statuses (dict[str, str], optional): The completion status keyed by subscription ID.
+
+        Returns:
+            bool: Whether a workflow was waiting for the request.
+        """
+        key = (kind, request_id)
+        with self._lock:
+            waiters = list(self._waiters.get(key, []))
+            if not waiters:
+                early_status, early_statuses = self._early.pop(key, (None, None))
+                self._early[key] = (status or early_status, dict(early_statuses or {}, **(statuses or {})))
+                while len(self._early) > self.max_early:
+                    self._early.popitem(last=False)
+        for waiter in waiters:
+            waiter.notify(status, statuses)
+        return bool(waiters)
+
+
+# The webhook routes only accept notifications carrying the shared secret, so notifications are
+# not relied on without one.
+if webhooks_enabled and not webhook_secret:
+    print("Error: KORE_WEBHOOKS_ENABLED is set without KORE_WEBHOOK_SECRET, completion webhooks are disabled.")
+notifications = NotificationRegistry(enabled=webhooks_enabled and bool(webhook_secret))
@@ -0,0 +1,47 @@
+from static.credentials import account_id
+
+
+SWITCH_FIELDS = ['eid', 'request_id', 'status', 'elapsed_time']
+QUERY_FIELDS = ['eid', 'profile', 'state']
+SWAP_FIELDS = ['eid', 'operation', 'carrier', 'request_id', 'status', 'elapsed_time']
+
+
+def download_item(row):
+    """
+    Builds the download or swap workflow arguments from a CSV row with the 'eid', 'imei' and
+    'bs_iccid' columns in the 4th, 2nd and 5th positions (0-indexed).
+
+    Returns:
+        tuple: (account_id, eid, imei, bs_iccid)
+    """
+    return account_id, row[4], row[2], row[5]
+
+
+def download_devices(activation_profile_id, rows):
+    """
+    Builds the devices of bulk_download_workflow from CSV rows laid out as for download_item.
+
+    Returns:
+        list[tuple]: (activation_profile_id, eid, imei, bs_iccid) for each row.
+    """
+    return [(activation_profile_id, row[4], row[2], row[5]) for row in rows]
+
+
+def terminate_item(row):
+    """
+    Builds the terminate workflow arguments from a CSV row with the 'eid' in the 4th position.
+
+    Returns:
+        tuple: (account_id, eid)
+    """
+    return account_id, row[4]
+
+
+def query_item(row):
+    """
+    Builds the query workflow arguments from a CSV row with the 'eid' in the first position.
+
+    Returns:
+        tuple: (account_id, eid)
+    """
+    return account_id, row[0]
@@ -0,0 +1,239 @@
+import random
+import time
+from utils.circuit_breaker import ApiUnavailable
+from utils.get_functions import (check_request_status,
+                                 check_provisioning_request_status,
+                                 get_provisioning_request_statuses)
+from utils.metrics import metrics
+from utils.notifications import notifications
+
+
+TERMINAL_STATUSES = ("completed", "failed")
+TIMED_OUT = "timed_out"
+
+
+class PollPolicy:
+    """
+    Describes how often and for how long a switch or provisioning request is polled.
+
+    The first fast_polls polls are fast_interval seconds apart. After that the interval grows
+    by multiplier on every poll up to max_interval. Every interval is randomised by +/- jitter
+    (a fraction of the interval) so that many requests submitted together do not poll in lockstep.
+    Once deadline seconds have passed since polling started the request is reported as "timed_out".
+
+    Args:
+        initial_delay (float): Seconds to wait before the first poll.
+        fast_polls (int): The number of polls made at fast_interval before backing off.
+        fast_interval (float): Seconds between the fast polls.
+        multiplier (float): The factor the interval grows by on every poll after the fast polls.
+        max_interval (float): The upper bound of the interval between two polls.
+        jitter (float): The fraction of the interval to randomise by, between 0 and 1.
+        deadline (float): Seconds after which polling gives up.
+    """
+
+    def __init__(self, initial_delay=0.0, fast_polls=5, fast_interval=1.0, multiplier=1.5,
+                 max_interval=15.0, jitter=0.1, deadline=900.0):
+        self.initial_delay = initial_delay
+        self.fast_polls = fast_polls
+        self.fast_interval = fast_interval
+        self.multiplier = multiplier
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.deadline = deadline
+
+    def interval(self, polls):
+        """
+        Returns the number of seconds to wait before the next poll.
+
+        Args:
+            polls (int): The number of polls made so far.
+
+        Returns:
+            float: The jittered interval in seconds.
+        """
+        if polls < self.fast_polls:
+            base = self.fast_interval
+        else:
+            base = min(self.fast_interval * self.multiplier ** (polls - self.fast_polls + 1), self.max_interval)
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+SWITCH_POLICY = PollPolicy()
+PROVISIONING_POLICY = PollPolicy(initial_delay=1.0, deadline=600.0)
+
+# Used when completion notifications are enabled: polling is only a slow safety net for lost
+# notifications.
+WEBHOOK_SWITCH_POLICY = PollPolicy(initial_delay=30.0, fast_polls=0, fast_interval=30.0, multiplier=1.0,
+                                   max_interval=30.0)
+WEBHOOK_PROVISIONING_POLICY = PollPolicy(initial_delay=30.0, fast_polls=0, fast_interval=30.0, multiplier=1.0,
+                                         max_interval=30.0, deadline=600.0)
+
+
+def _sleep(seconds, waiter):
+    if waiter is None:
+        time.sleep(seconds)
+    else:
+        waiter.wait(seconds)
+
+
+def _is_terminal(status):
+    return bool(status) and status.lower() in TERMINAL_STATUSES
+
+
+def _poll(check, unanswered):
+    """
+    Calls check, returning unanswered instead while the circuit breaker of the API is open, so
+    that a request already submitted keeps being polled until the API recovers or the deadline
+    passes instead of being lost.
+    """
+    try:
+        return check()
+    except ApiUnavailable as e:
+        print(f"Error: {str(e)}")
+        return unanswered
+
+
+def wait_for_status(check, policy, kind='status', waiter=None):
+    """
+    Polls a status function until it returns a terminal status or the policy's deadline passes.
+
+    Args:
+        check (callable): Called without arguments, returns the current status string.
+        policy (PollPolicy): The polling policy to follow.
+        kind (str): The kind of request polled, used to label the poll count metric.
+        waiter (Waiter, optional): Receives completion notifications for the request (see
+                                   utils.notifications). A notified terminal status is returned
+                                   as soon as it arrives, without waiting for the next poll.
+
+    Returns:
+        str: The terminal status returned by check ("completed" or "failed"), or "timed_out".
+             A poll made while the circuit breaker of the API is open counts as unanswered.
+    """
+    deadline = time.monotonic() + policy.deadline
+    _sleep(policy.initial_delay, waiter)
+    polls = 0
+    while True:
+        if waiter is not None and _is_terminal(waiter.current_status()):
+            metrics.observe_polls(kind, polls)
+            return waiter.current_status()
+        status = _poll(check, '')
+        polls += 1
+        if _is_terminal(status):
+            metrics.observe_polls(kind, polls)
+            return status
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            metrics.observe_polls(kind, polls)
+            return TIMED_OUT
+        _sleep(min(policy.interval(polls), remaining), waiter)
+
+
+def _wait_notified(kind, request_id, policy, default_policy, webhook_policy, wait):
+    """
+    Calls wait(policy, waiter), with a waiter registered for the request and webhook_policy as
+    the default policy if completion notifications are enabled, and with no waiter and
+    default_policy otherwise.
+    """
+    if not notifications.enabled:
+        return wait(policy or default_policy, None)
+    waiter = notifications.register(kind, request_id)
+    try:
+        return wait(policy or webhook_policy, waiter)
+    finally:
+        notifications.release(waiter)
+
+
+def wait_for_switch_request(account_id, request_id, policy=None):
+    """
+    Polls check_request_status until the switch request completes, fails or times out.
+
+    When completion notifications are enabled, a notification for the request ends the wait
+    at once and polling falls back to WEBHOOK_SWITCH_POLICY.
+
+    Args:
+        account_id (str): The ID of the account associated with the switch request.
+        request_id (str): The ID of the switch request.
+        policy (PollPolicy, optional): The polling policy to follow. Defaults to SWITCH_POLICY,
+                                       or WEBHOOK_SWITCH_POLICY with notifications enabled.
+
+    Returns:
+        str: "completed", "failed" or "timed_out".
+    """
+    def wait(policy, waiter):
+        return wait_for_status(lambda: check_request_status(account_id, request_id), policy, 'switch', waiter)
+    return _wait_notified('switch', request_id, policy, SWITCH_POLICY, WEBHOOK_SWITCH_POLICY, wait)
+
+
+def wait_for_provisioning_request(account_id, provisioning_request_id, policy=None):
+    """
+    Polls check_provisioning_request_status until the provisioning request completes, fails or times out.
+
+    When completion notifications are enabled, a notification for the request ends the wait
+    at once and polling falls back to WEBHOOK_PROVISIONING_POLICY.
+
+    Args:
+        account_id (str): The account ID of the provisioning request.
+        provisioning_request_id (str): The provisioning request ID.
+        policy (PollPolicy, optional): The polling policy to follow. Defaults to PROVISIONING_POLICY,
+                                       or WEBHOOK_PROVISIONING_POLICY with notifications enabled.
+
+    Returns:
+        str: "completed", "failed" or "timed_out".
+    """
+    def wait(policy, waiter):
+        return wait_for_status(lambda: check_provisioning_request_status(account_id, provisioning_request_id),
+                               policy, 'provisioning', waiter)
+    return _wait_notified('provisioning', provisioning_request_id, policy, PROVISIONING_POLICY,
+                          WEBHOOK_PROVISIONING_POLICY, wait)
+
+
+def wait_for_provisioning_subscriptions(account_id, provisioning_request_id, subscription_ids, policy=None):
+    """
+    Polls get_provisioning_request_statuses until every subscription of the provisioning request
+    has completed or failed, or the policy's deadline passes.
+
+    When completion notifications are enabled, notified subscription statuses are taken as they
+    arrive and polling falls back to WEBHOOK_PROVISIONING_POLICY.
+
+    Args:
+        account_id (str): The account ID of the provisioning request.
+        provisioning_request_id (str): The provisioning request ID.
+        subscription_ids (list[str]): The subscription IDs covered by the provisioning request.
+        policy (PollPolicy, optional): The polling policy to follow. Defaults to PROVISIONING_POLICY,
+                                       or WEBHOOK_PROVISIONING_POLICY with notifications enabled.
+
+    Returns:
+        dict[str, str]: "completed", "failed" or "timed_out" keyed by subscription ID.
+    """
+    def wait(policy, waiter):
+        deadline = time.monotonic() + policy.deadline
+        _sleep(policy.initial_delay, waiter)
+        statuses = {}
+        pending = set(subscription_ids)
+
+        def settle(reported):
+            for subscription_id, status in reported.items():
+                if subscription_id in pending and _is_terminal(status):
+                    statuses[subscription_id] = status
+                    pending.discard(subscription_id)
+
+        polls = 0
+        while True:
+            if waiter is not None:
+                settle(dict(waiter.statuses))
+                if _is_terminal(waiter.status):
+                    settle({subscription_id: waiter.status for subscription_id in pending})
+            if pending:
+                settle(_poll(lambda: get_provisioning_request_statuses(account_id, provisioning_request_id), {}))
+                polls += 1
+            if not pending:
+                metrics.observe_polls('provisioning', polls)
+                return statuses
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.observe_polls('provisioning', polls)
+                statuses.update((subscription_id, TIMED_OUT) for subscription_id in pending)
+                return statuses
+            _sleep(min(policy.interval(polls), remaining), waiter)
+    return _wait_notified('provisioning', provisioning_request_id, policy, PROVISIONING_POLICY,
+                          WEBHOOK_PROVISIONING_POLICY, wait)
@@ -1,32 +1,36 @@
 import requests
 import json
-from static.credentials import username, api_headers
+from static.credentials import username, api_base_url, api_headers
+from utils.circuit_breaker import ApiUnavailable
+from utils.client import api_request
+from utils.metrics import timed
+from utils.token_manager import token_manager
 
 
-def download_vzw_profile(account_id, eid, imei):
+VZW_ACTIVATION_PROFILE = "cmp-prov-ap-12548"
+ATT_ACTIVATION_PROFILE = "cmp-prov-ap-11052"
+
+
+@timed
+def download_profiles(account_id, activation_profile_id, subscriptions):
     """
-    Sends a request to download a VZW profile using the Kore Wireless ConnectivityPro API.
+    Sends a single request to download profiles to one or more EIDs using the Kore Wireless ConnectivityPro API.
 
     Args:
-        account_id (str): The ID of the account associated with the profile.
-        eid (str): The EID of the device for which the profile is requested.
-        imei (str): The IMEI of the device.
+        account_id (str): The ID of the account associated with the profiles.
+        activation_profile_id (str): The activation profile to download, e.g. VZW_ACTIVATION_PROFILE.
+        subscriptions (list[dict]): One entry per device, e.g. {"eid": eid, "imei": imei}.
 
     Returns:
-        None
+        str: The request ID of the download request. It covers every EID in subscriptions.
 
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/esim-profile-download-requests"
+    url = f"{api_base_url}/accounts/{account_id}/esim-profile-download-requests"
 
     payload = json.dumps({
         "download": {
-            "activation-profile-id": "cmp-prov-ap-12548",
-            "subscriptions": [
-                {
-                    "eid": eid,
-                    "imei": imei
-                },
-            ],
+            "activation-profile-id": activation_profile_id,
+            "subscriptions": subscriptions,
             "service-type-info": {
                 "aus-ipnd-info": {
                     "first-name": username,
@@ -37,15 +41,46 @@ def download_vzw_profile(account_id, eid, imei):
     })
     headers = api_headers
 
-    response = requests.request("POST", url, headers=headers, data=payload)
+    response = api_request("POST", url, headers=headers, data=payload, auth=token_manager)
     response_json = response.json()
     request_id = response_json["data"]["request-id"]
     return request_id
 
 
-def download_att_profile(account_id, eid):
+def vzw_subscription(eid, imei):
     """
-    Sends a request to download an ATT profile using the Kore Wireless ConnectivityPro API.
+    Builds the download request entry for a VZW profile.
+
+    Args:
+        eid (str): The EID of the device.
+        imei (str): The IMEI of the device.
+
+    Returns:
+        dict: The entry for the 'subscriptions' list of download_profiles.
+
+    """
+    return {"eid": eid, "imei": imei}
+
+
+def att_subscription(eid, imei=None):
+    """
+    Builds the download request entry for an ATT profile. The ATT request does not take an IMEI.
+
+    Args:
+        eid (str): The EID of the device.
+        imei (str, optional): Ignored.
+
+    Returns:
+        dict: The entry for the 'subscriptions' list of download_profiles.
+
+    """
+    return {"eid": eid}
+
+
+@timed
+def download_vzw_profile(account_id, eid, imei):
+    """
+    Sends a request to download a VZW profile using the Kore Wireless ConnectivityPro API.
 
     Args:
         account_id (str): The ID of the account associated with the profile.
@@ -53,35 +88,29 @@ def download_att_profile(account_id, eid):
         imei (str): The IMEI of the device.
 
     Returns:
-        None
+        str: The request ID of the download request.
 
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/esim-profile-download-requests"
+    return download_profiles(account_id, VZW_ACTIVATION_PROFILE, [vzw_subscription(eid, imei)])
 
-    payload = json.dumps({
-        "download": {
-            "activation-profile-id": "cmp-prov-ap-11052",
-            "subscriptions": [
-                {
-                    "eid": eid
-                },
-            ],
-            "service-type-info": {
-                "aus-ipnd-info": {
-                    "first-name": username,
-                    "last-name": username
-                }
-            }
-        }
-    })
-    headers = api_headers
 
-    response = requests.request("POST", url, headers=headers, data=payload)
-    response_json = response.json()
-    request_id = response_json["data"]["request-id"]
-    return request_id
+@timed
+def download_att_profile(account_id, eid):
+    """
+    Sends a request to download an ATT profile using the Kore Wireless ConnectivityPro API.
+
+    Args:
+        account_id (str): The ID of the account associated with the profile.
+        eid (str): The EID of the device for which the profile is requested.
+
+    Returns:
+        str: The request ID of the download request.
+
+    """
+    return download_profiles(account_id, ATT_ACTIVATION_PROFILE, [att_subscription(eid)])
 
 
+@timed
 def force_retry_switch_request(account_id, esim_profile_switch_request_id, eids):
     """
     Forcefully retry an eSIM profile switch request.
@@ -99,14 +128,14 @@ def force_retry_switch_request(account_id, esim_profile_switch_request_id, eids)
         a 'status' field. Otherwise, it returns None.
 
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/esim-profile-switch-requests/retry"
+    url = f"{api_base_url}/accounts/{account_id}/esim-profile-switch-requests/retry"
     headers = api_headers
     payload = {
         "esim-profile-switch-request-id": esim_profile_switch_request_id,
         "eids": eids,
         "skip-session-check": "true"
     }
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
+    response = api_request("POST", url, headers=headers, data=json.dumps(payload), auth=token_manager)
 
     if response.status_code == 200:
         data = response.json()
@@ -115,16 +144,17 @@ def force_retry_switch_request(account_id, esim_profile_switch_request_id, eids)
     return None
 
 
-def terminate_profile(account_id, subscription_id):
+@timed
+def terminate_profiles(account_id, subscription_ids):
     """
-    Terminates the subscription for a given account ID and subscription ID.
+    Terminates several subscriptions with a single provisioning request.
 
-    This function sends a POST request to the Kore Wireless API, terminates the subscription
-    for the given account ID and subscription ID, and retrieves the provisioning request ID.
+    This function sends a POST request to the Kore Wireless API, terminates the subscriptions
+    for the given account ID and subscription IDs, and retrieves the provisioning request ID.
 
     Args:
-        account_id (str): The account ID of the subscription to terminate.
-        subscription_id (str): The subscription ID to terminate.
+        account_id (str): The account ID of the subscriptions to terminate.
+        subscription_ids (list[str]): The subscription IDs to terminate.
 
     Returns:
         str: The provisioning request ID if the request was successful, '' otherwise.
@@ -132,24 +162,43 @@ def terminate_profile(account_id, subscription_id):
     Raises:
         requests.RequestException: If there was a problem with the POST request.
     """
-    url = f"https://api.korewireless.com/connectivity/v1/accounts/{account_id}/provisioning-requests/terminate"
+    url = f"{api_base_url}/accounts/{account_id}/provisioning-requests/terminate"
     payload = json.dumps({
         "terminate": {
             "subscriptions": [
                 {
                     "subscription-id": subscription_id
                 }
+                for subscription_id in subscription_ids
             ]
         }
     })
     headers = api_headers
 
     try:
-        response = requests.request("POST", url, headers=headers, data=payload)
+        response = api_request("POST", url, headers=headers, data=payload, auth=token_manager)
         data = response.json()
 
         return data.get('data', {}).get('provisioning-request-id', '')
 
+    except ApiUnavailable:
+        raise
+
     except requests.RequestException as e:
         print(f"Error: {str(e)}")
         return ''
+
+
+@timed
+def terminate_profile(account_id, subscription_id):
+    """
+    Terminates the subscription for a given account ID and subscription ID.
+
+    Args:
+        account_id (str): The account ID of the subscription to terminate.
+        subscription_id (str): The subscription ID to terminate.
+
+    Returns:
+        str: The provisioning request ID if the request was successful, '' otherwise.
+    """
+    return terminate_profiles(account_id, [subscription_id])
@@ -0,0 +1,156 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+RATE_LIMITS = {
+    'read': (20.0, 20),
+    'write': (5.0, 5),
+    'token': (1.0, 2)
+}
+DEFAULT_RETRY_AFTER = 1.0
+MAX_RETRY_AFTER = 60.0
+
+
+class TokenBucket:
+    """
+    Limits calls to a steady rate while allowing short bursts.
+
+    A caller reserves a token and waits until the token is due, so concurrent callers queue up
+    behind each other instead of all calling at once and being throttled together. When the API
+    answers 429, pause stops all callers until the Retry-After time has passed and restarts the
+    bucket empty, so throughput resumes at the limit instead of with a burst.
+
+    Args:
+        rate (float): The number of calls per second.
+        burst (int): The number of calls that may be made at once after an idle period.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Reserves a call and returns how long the caller has to wait before making it.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._updated, self._paused_until)
+            if now > start:
+                self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+                self._updated = now
+            self._tokens -= 1
+            wait = max(self._paused_until - now, 0.0)
+            if self._tokens < 0:
+                wait = max(wait, max(self._paused_until, now) - now - self._tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        """
+        Blocks until the caller may make a call.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stops all callers for the given number of seconds, e.g. after a 429 response.
+
+        Args:
+            seconds (float): The number of seconds to pause for.
+        """
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = until
+
+
+class RateLimiter:
+    """
+    Process-wide token buckets per endpoint class: 'token' for the token endpoint, 'read' for
+    other GET requests and 'write' for everything else.
+
+    Args:
+        limits (dict[str, tuple[float, int]]): The (rate, burst) of each endpoint class.
+    """
+
+    def __init__(self, limits=None):
+        self._buckets = {endpoint_class: TokenBucket(rate, burst)
+                         for endpoint_class, (rate, burst) in (limits or RATE_LIMITS).items()}
+
+    def configure(self, endpoint_class, rate, burst):
+        """
+        Replaces the limit of an endpoint class.
+
+        Args:
+            endpoint_class (str): 'read', 'write' or 'token'.
+            rate (float): The number of calls per second.
+            burst (int): The number of calls that may be made at once after an idle period.
+        """
+        self._buckets[endpoint_class] = TokenBucket(rate, burst)
+
+    def bucket(self, method, url):
+        """
+        Returns:
+            TokenBucket: The bucket of the endpoint class of the request.
+        """
+        return self._buckets[endpoint_class(method, url)]
+
+
+def endpoint_class(method, url):
+    """
+    Returns the endpoint class of a request: 'token', 'read' or 'write'.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL of the request.
+
+    Returns:
+        str: The endpoint class.
+    """
+    path = url.split('?', 1)[0].rstrip('/')
+    if path.endswith('/token'):
+        return 'token'
+    if method.upper() == 'GET':
+        return 'read'
+    return 'write'
+
+
+def retry_after(value, attempt=0):
+    """
+    Parses a Retry-After header given in seconds or as an HTTP date.
+
+    Args:
+        value (str or None): The header value.
+        attempt (int): The number of 429 responses in a row, used to back off when the header
+                       is missing.
+
+    Returns:
+        float: The number of seconds to wait, at most MAX_RETRY_AFTER.
+    """
+    seconds = None
+    if value:
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+    if seconds is None:
+        seconds = DEFAULT_RETRY_AFTER * 2 ** attempt
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+rate_limiter = RateLimiter()
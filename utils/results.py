@@ -0,0 +1,75 @@
+import csv
+import os
+import threading
+
+
+RESULTS_FOLDER = 'results'
+
+
+def results_path(job_id, folder=RESULTS_FOLDER):
+    """
+    Returns the path of the results file of a job.
+
+    Args:
+        job_id (str): The ID of the job.
+        folder (str): The directory holding the results files.
+
+    Returns:
+        str: The path of the job's results CSV file.
+    """
+    return os.path.join(folder, f"{job_id}.csv")
+
+
+class ResultsWriter:
+    """
+    Appends results.csv rows to a file as each EID finishes.
+
+    Every write is flushed and synced to disk before it returns, so the file holds every finished
+    EID even if the process dies mid-batch, and it can be downloaded while the job is still running.
+    Opening an existing file appends to it without repeating the header.
+
+    Args:
+        path (str): The path of the results file.
+        fieldnames (list[str]): The column names of the file.
+    """
+
+    def __init__(self, path, fieldnames):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if is_new:
+            self._writer.writeheader()
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def write(self, rows):
+        """
+        Appends the rows of one EID and syncs them to disk.
+
+        Args:
+            rows (list[dict]): The results.csv rows of the EID.
+        """
+        if not rows:
+            return
+        with self._lock:
+            self._writer.writerows(rows)
+            self._sync()
+
+    def close(self):
+        """
+        Closes the results file.
+        """
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
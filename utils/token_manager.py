@@ -0,0 +1,117 @@
+import threading
+import time
+from requests.auth import AuthBase
+from static.credentials import token_url, client_id, client_secret_key
+from utils.init import request_access_token
+
+
+REFRESH_MARGIN = 60
+
+
+class TokenManager(AuthBase):
+    """
+    Fetches the bearer token lazily, caches it until shortly before it expires and adds it to requests.
+
+    The token is fetched on first use rather than at import time. Once the token is within
+    refresh_margin seconds of expiring, a single caller refreshes it while concurrent callers keep
+    using the still-valid token, so a pool of workers never stampedes the token endpoint. Only when
+    there is no valid token at all do callers wait for the refresh.
+
+    Used as the ``auth`` of a request, it sets the Authorization header and retries the request
+    once with a fresh token if the API answers 401.
+
+    Args:
+        fetch (callable): Called without arguments, returns (token, expires_in seconds) or None.
+        refresh_margin (float): Seconds before expiry at which the token is refreshed.
+    """
+
+    def __init__(self, fetch, refresh_margin=REFRESH_MARGIN):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        result = self.fetch()
+        if result is None:
+            raise RuntimeError("Unable to retrieve an access token.")
+        token, expires_in = result
+        now = time.monotonic()
+        self._token = token
+        self._expires_at = now + expires_in
+        self._refresh_at = now + max(expires_in - self.refresh_margin, 0)
+
+    def token(self):
+        """
+        Returns a valid access token, fetching or refreshing it if needed.
+
+        Returns:
+            str: The access token.
+
+        Raises:
+            RuntimeError: If there is no valid token and the token request failed.
+        """
+        now = time.monotonic()
+        if self._token is not None and now < self._refresh_at:
+            return self._token
+
+        if self._token is not None and now < self._expires_at:
+            if self._lock.acquire(blocking=False):
+                try:
+                    if time.monotonic() >= self._refresh_at:
+                        self._refresh()
+                except Exception as e:
+                    print(f"Error: {str(e)}")
+                finally:
+                    self._lock.release()
+            return self._token
+
+        with self._lock:
+            if self._token is None or time.monotonic() >= self._expires_at:
+                self._refresh()
+            return self._token
+
+    def invalidate(self, token):
+        """
+        Discards the cached token if it is still the given one, e.g. after the API rejected it.
+
+        Args:
+            token (str): The token that was rejected.
+        """
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._expires_at = 0.0
+                self._refresh_at = 0.0
+
+    def __call__(self, r):
+        r.headers['Authorization'] = 'Bearer ' + self.token()
+        r.register_hook('response', self.handle_401)
+        return r
+
+    def handle_401(self, r, **kwargs):
+        """
+        Response hook that retries a request once with a fresh token if it was answered with 401.
+
+        Returns:
+            requests.Response: The original response, or the response of the retried request.
+        """
+        if r.status_code != 401 or getattr(r.request, 'token_retried', False):
+            return r
+
+        self.invalidate(r.request.headers.get('Authorization', '')[len('Bearer '):])
+        r.content
+        r.close()
+
+        prep = r.request.copy()
+        prep.token_retried = True
+        prep.headers['Authorization'] = 'Bearer ' + self.token()
+        retried = r.connection.send(prep, **kwargs)
+        retried.history.append(r)
+        retried.request = prep
+        return retried
+
+
+token_manager = TokenManager(lambda: request_access_token(token_url, client_id, client_secret_key))
@@ -0,0 +1,824 @@
+import time
+from utils.circuit_breaker import ApiUnavailable
+from utils.inflight import inflight, single_flight
+from utils.init import compare_values
+from utils.eid_state import EidState, VZW_PRODUCT, ATT_PRODUCT
+from utils.get_functions import get_eid_state
+from utils.post_functions import (download_profiles,
+                                  download_vzw_profile,
+                                  force_retry_switch_request,
+                                  terminate_profile,
+                                  terminate_profiles,
+                                  download_att_profile,
+                                  vzw_subscription,
+                                  att_subscription,
+                                  VZW_ACTIVATION_PROFILE,
+                                  ATT_ACTIVATION_PROFILE)
+from utils.batch import iter_batch_items, run_batch, BATCH_WORKERS
+from utils.polling import (wait_for_switch_request,
+                           wait_for_provisioning_request,
+                           wait_for_provisioning_subscriptions,
+                           TIMED_OUT)
+
+
+BULK_CHUNK_SIZE = 100
+
+
+def _get_eid_state(account_id, eid, inventory=None):
+    """
+    Returns the state of an EID built from the inventory if one is given, else from the API.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        inventory (SubscriptionInventory, optional): See utils.inventory.
+
+    Returns:
+        EidState: The profiles of the EID, with found=False if the API request failed.
+    """
+    if inventory is not None:
+        return EidState.from_snapshot(eid, inventory.snapshot(eid))
+    return get_eid_state(account_id, eid)
+
+
+def _check_download(account_id, eid, bs_iccid, product, carrier_name, inventory=None):
+    """
+    Checks whether a profile download may be started for a single EID.
+
+    The active ICCID must match the provided bootstrap ICCID and the carrier profile must not
+    already be in the Ready state.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        product (str): The product of the carrier profile, VZW_PRODUCT or ATT_PRODUCT.
+        carrier_name (str): The carrier name used in the result messages, e.g. 'a Verizon'.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+
+    Returns:
+        tuple[list[str], list[dict]]: The reasons the download may not start (empty if it may)
+                                      and no results.csv rows.
+    """
+    messages = []
+
+    state = _get_eid_state(account_id, eid, inventory)
+    is_bootstrap = compare_values(state.active_iccid, bs_iccid)
+
+    if state.ready_profile(product) is not None:
+        messages.append(f"EID {eid} has {carrier_name} profile in the Ready state. "
+                        f"Terminate the profile and try again.")
+    if not is_bootstrap:
+        messages.append(f"EID {eid} does not match the provided Bootstrap ICCID.")
+
+    return messages, []
+
+
+def _resuming(journal, eid, step):
+    """
+    Returns:
+        bool: Whether the journal records the step of the EID as submitted by an earlier run.
+    """
+    return journal is not None and journal.step(eid, step) is not None
+
+
+def _run_step(journal, eid, step, submit, wait, after_submit=None):
+    """
+    Submits a request and waits for it to finish, or re-attaches to the request of the step
+    that the journal records as submitted by an earlier run of the job (see utils.journal).
+
+    Args:
+        journal (Journal or None): The journal of the job.
+        eid (str or list[str]): The EID(s) covered by the request. Only a single EID is journaled.
+        step (str): The step, e.g. 'download' or 'terminate'.
+        submit (callable): Called without arguments to submit the request, returns its ID.
+        wait (callable): Called with the request ID, returns its final status.
+        after_submit (callable, optional): Called with the request ID of a newly submitted
+                                           request once it is journaled, e.g. to force a retry.
+
+    Returns:
+        tuple[str, str, float]: The request ID, the final status and the elapsed time in seconds.
+    """
+    entry = journal.step(eid, step) if journal is not None else None
+    if entry is not None and entry.get('status'):
+        return entry['request_id'], entry['status'], entry['elapsed_time']
+
+    if entry is not None:
+        request_id, start_time = entry['request_id'], entry['submitted_at']
+    else:
+        start_time = time.time()
+        request_id = submit()
+        if journal is not None:
+            journal.record(eid, 'submitted', step=step, request_id=request_id, submitted_at=start_time)
+        if after_submit is not None:
+            after_submit(request_id)
+
+    status = wait(request_id)
+    elapsed_time = time.time() - start_time
+    if journal is not None:
+        journal.record(eid, 'confirmed', step=step, request_id=request_id, status=status,
+                       elapsed_time=elapsed_time)
+    return request_id, status, elapsed_time
+
+
+def _submit_download(account_id, eids, submit, journal=None):
+    """
+    Submits a download request, forces a retry of the switch request and waits for it to finish
+    (see utils.polling.SWITCH_POLICY), or re-attaches to the download request in the journal.
+
+    Args:
+        account_id (str): The ID of the account associated with the EIDs.
+        eids (str or list[str]): The EID(s) covered by the download request.
+        submit (callable): Called without arguments to submit the download request.
+        journal (Journal, optional): The journal of the job, for a single EID.
+
+    Returns:
+        tuple[str, str, float]: The request ID, the final status and the elapsed time in seconds.
+    """
+    def force_retry(request_id):
+        time.sleep(1)
+        force_retry_switch_request(account_id, request_id, eids)
+
+    return _run_step(journal, eids, 'download', submit,
+                     lambda request_id: wait_for_switch_request(account_id, request_id), force_retry)
+
+
+def _submit_terminate(account_id, eid, subscription_id, journal=None):
+    """
+    Terminates a subscription and waits for the provisioning request to finish
+    (see utils.polling.PROVISIONING_POLICY), or re-attaches to the request in the journal.
+
+    Returns:
+        tuple[str, str, float]: The provisioning request ID, the final status and the elapsed
+                                time in seconds.
+    """
+    return _run_step(journal, eid, 'terminate', lambda: terminate_profile(account_id, subscription_id),
+                     lambda request_id: wait_for_provisioning_request(account_id, request_id))
+
+
+def _download_result(eid, request_id, status, elapsed_time):
+    """
+    Builds the result messages and results.csv row of a finished download request for one EID.
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    messages = []
+    if status.lower() == "completed":
+        messages.append(f"Profile downloaded for EID: {eid}")
+    elif status == TIMED_OUT:
+        messages.append(f"Profile download for EID: {eid} has timed out.")
+    else:
+        messages.append(f"Profile download for EID: {eid} has failed.")
+    messages.append(f"Elapsed Time: {elapsed_time} seconds")
+    rows = [{
+        'eid': eid,
+        'request_id': request_id,
+        'status': status,
+        'elapsed_time': elapsed_time
+    }]
+    return messages, rows
+
+
+def _download_workflow(account_id, eid, bs_iccid, product, download, carrier_name, inventory=None, journal=None):
+    """
+    Runs the profile download workflow for a single EID.
+
+    Checks the active ICCID against the provided bootstrap ICCID and that the carrier profile
+    is not already in the Ready state, initiates the profile download, forces a retry of the
+    switch request and polls the switch request until it completes, fails or times out
+    (see utils.polling.SWITCH_POLICY).
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        product (str): The product of the carrier profile, VZW_PRODUCT or ATT_PRODUCT.
+        download (callable): Called without arguments to submit the download request.
+        carrier_name (str): The carrier name used in the result messages, e.g. 'a Verizon'.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID, and re-attaches to a download
+                                     request submitted by an earlier run (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    if not _resuming(journal, eid, 'download'):
+        messages, rows = _check_download(account_id, eid, bs_iccid, product, carrier_name, inventory)
+        if messages:
+            return messages, rows
+        if journal is not None:
+            journal.record(eid, 'checked')
+
+    request_id, status, elapsed_time = _submit_download(account_id, eid, download, journal)
+    return _download_result(eid, request_id, status, elapsed_time)
+
+
+@single_flight('download_vzw')
+def download_vzw_workflow(account_id, eid, imei, bs_iccid, inventory=None, journal=None):
+    """
+    Downloads a Verizon profile to a single EID. See _download_workflow.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        imei (str): The IMEI of the device.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    return _download_workflow(account_id, eid, bs_iccid, VZW_PRODUCT,
+                              lambda: download_vzw_profile(account_id, eid, imei),
+                              'a Verizon', inventory, journal)
+
+
+@single_flight('download_att')
+def download_att_workflow(account_id, eid, imei, bs_iccid, inventory=None, journal=None):
+    """
+    Downloads an ATT profile to a single EID. See _download_workflow.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        imei (str): The IMEI of the device. Not used by the ATT download request.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    return _download_workflow(account_id, eid, bs_iccid, ATT_PRODUCT,
+                              lambda: download_att_profile(account_id, eid),
+                              'an ATT', inventory, journal)
+
+
+DOWNLOAD_CARRIERS = {
+    VZW_ACTIVATION_PROFILE: (VZW_PRODUCT, vzw_subscription, 'a Verizon'),
+    ATT_ACTIVATION_PROFILE: (ATT_PRODUCT, att_subscription, 'an ATT')
+}
+
+DOWNLOAD_OPERATIONS = {
+    VZW_ACTIVATION_PROFILE: 'download_vzw',
+    ATT_ACTIVATION_PROFILE: 'download_att'
+}
+
+
+def _download_chunk(account_id, activation_profile_id, devices):
+    """
+    Downloads a profile to a chunk of devices with a single download request.
+
+    Args:
+        account_id (str): The ID of the account associated with the EIDs.
+        activation_profile_id (str): The activation profile to download.
+        devices (list[tuple[str, str]]): The (eid, imei) of each device in the chunk.
+
+    Returns:
+        tuple[str, str, float]: The request ID, the final status and the elapsed time in seconds.
+    """
+    product, subscription, carrier_name = DOWNLOAD_CARRIERS[activation_profile_id]
+    eids = [eid for eid, imei in devices]
+    subscriptions = [subscription(eid, imei) for eid, imei in devices]
+    return _submit_download(account_id, eids,
+                            lambda: download_profiles(account_id, activation_profile_id, subscriptions))
+
+
+def _chunk_error(item, error):
+    """
+    Builds the result of a chunk whose download or provisioning request raised an exception.
+
+    Returns:
+        tuple[None, Exception, float]: No request ID, the exception and no elapsed time.
+    """
+    return None, error, 0
+
+
+def _publish_error(chunk, error):
+    """
+    Reports an exception raised while publishing the results of a chunk, e.g. by on_result.
+    """
+    print(f"Error: {str(error)}")
+
+
+def bulk_download_workflow(account_id, devices, chunk_size=BULK_CHUNK_SIZE, max_workers=BATCH_WORKERS,
+                           inventory=None, on_result=None):
+    """
+    Downloads profiles to many EIDs using multi-EID download requests.
+
+    Every device is checked as in _download_workflow. The devices that pass are grouped by
+    activation profile and split into chunks of chunk_size, and each chunk is submitted as one
+    esim-profile-download-requests call whose request ID is mapped back to every EID in the chunk.
+    Chunks are submitted and polled concurrently. An EID listed more than once, or already being
+    downloaded by another batch, is downloaded once and shares the result (see utils.inflight).
+
+    Args:
+        account_id (str): The ID of the account associated with the EIDs.
+        devices (list[tuple[str, str, str, str]]): The (activation_profile_id, eid, imei, bs_iccid)
+                                                   of each device.
+        chunk_size (int): The maximum number of EIDs per download request.
+        max_workers (int): The maximum number of checks or chunks processed at the same time.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        on_result (callable, optional): Called as on_result(index, result) with the index of a
+                                        device and its result as soon as it is known: once the
+                                        checks are done for a device that may not be downloaded,
+                                        and once the poll of its chunk finishes otherwise. It is
+                                        called from the worker threads.
+
+    Returns:
+        list[tuple[list[str], list[dict]]]: The result messages and results.csv rows of each
+                                            device, in input order. The result of a device whose
+                                            check or chunk raised is an ErrorResult.
+    """
+    keys = [(DOWNLOAD_OPERATIONS[device[0]], account_id, device[1]) for device in devices]
+
+    def run(indexes, done):
+        return _bulk_download(account_id, [devices[index] for index in indexes], chunk_size, max_workers, inventory,
+                              lambda position, result: done(indexes[position], result))
+    return inflight.run_many(keys, run, on_result)
+
+
+def _bulk_download(account_id, devices, chunk_size, max_workers, inventory, done):
+    """
+    Runs bulk_download_workflow for devices with distinct EIDs that are not in flight elsewhere,
+    calling done(index, result) as the result of each device is known.
+    """
+    checks = []
+    for activation_profile_id, eid, imei, bs_iccid in devices:
+        product, subscription, carrier_name = DOWNLOAD_CARRIERS[activation_profile_id]
+        checks.append((account_id, eid, bs_iccid, product, carrier_name, inventory))
+    results = run_batch(checks, _check_download, workflow_error, max_workers)
+
+    groups = {}
+    for index, (messages, rows) in enumerate(results):
+        if messages:
+            done(index, results[index])
+        else:
+            groups.setdefault(devices[index][0], []).append(index)
+
+    chunks = []
+    for activation_profile_id, indexes in groups.items():
+        for start in range(0, len(indexes), chunk_size):
+            chunks.append((activation_profile_id, indexes[start:start + chunk_size]))
+
+    def run_chunk(activation_profile_id, indexes):
+        item = (account_id, activation_profile_id, [devices[index][1:3] for index in indexes])
+        try:
+            request_id, status, elapsed_time = _download_chunk(*item)
+        except Exception as e:
+            request_id, status, elapsed_time = _chunk_error(item, e)
+        for index in indexes:
+            eid = devices[index][1]
+            if request_id is None:
+                results[index] = workflow_error((account_id, eid), status)
+            else:
+                results[index] = _download_result(eid, request_id, status, elapsed_time)
+            done(index, results[index])
+
+    run_batch(chunks, run_chunk, _publish_error, max_workers)
+    return results
+
+
+def _check_terminate(account_id, eid, product, carrier_name, inventory=None):
+    """
+    Checks whether the carrier profile is present in the Ready state on a single EID.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        product (str): The product of the carrier profile, VZW_PRODUCT or ATT_PRODUCT.
+        carrier_name (str): The carrier name used in the result messages, e.g. 'a Verizon'.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+
+    Returns:
+        tuple[list[str], str]: The reasons the termination may not start (empty if it may)
+                               and the subscription ID of the Ready profile.
+    """
+    profile = _get_eid_state(account_id, eid, inventory).ready_profile(product)
+    if profile is not None:
+        return [], profile.subscription_id
+    return [f"EID {eid} does not have {carrier_name} profile in the Ready state present."], ''
+
+
+def _terminate_result(eid, provisioning_request_id, status, elapsed_time):
+    """
+    Builds the result messages and results.csv row of a finished termination for one EID.
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    messages = []
+    if status.lower() == "completed":
+        messages.append(f"Profile terminated for EID: {eid}")
+    elif status == TIMED_OUT:
+        messages.append(f"Profile terminate for EID: {eid} has timed out.")
+    else:
+        messages.append(f"Profile terminate for EID: {eid} has failed.")
+    messages.append(f"Elapsed Time: {elapsed_time} seconds")
+    rows = [{
+        'eid': eid,
+        'request_id': provisioning_request_id,
+        'status': status,
+        'elapsed_time': elapsed_time
+    }]
+    return messages, rows
+
+
+def _terminate_workflow(account_id, eid, product, carrier_name, inventory=None, journal=None):
+    """
+    Runs the profile termination workflow for a single EID.
+
+    Checks whether the carrier profile is present in the Ready state, terminates it and polls
+    the provisioning request until it completes, fails or times out
+    (see utils.polling.PROVISIONING_POLICY).
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        product (str): The product of the carrier profile, VZW_PRODUCT or ATT_PRODUCT.
+        carrier_name (str): The carrier name used in the result messages, e.g. 'a Verizon'.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID, and re-attaches to a
+                                     provisioning request submitted by an earlier run
+                                     (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    subscription_id = ''
+    if not _resuming(journal, eid, 'terminate'):
+        messages, subscription_id = _check_terminate(account_id, eid, product, carrier_name, inventory)
+        if messages:
+            return messages, []
+        if journal is not None:
+            journal.record(eid, 'checked')
+
+    provisioning_request_id, status, elapsed_time = _submit_terminate(account_id, eid, subscription_id, journal)
+    return _terminate_result(eid, provisioning_request_id, status, elapsed_time)
+
+
+@single_flight('terminate_vzw')
+def terminate_vzw_workflow(account_id, eid, inventory=None, journal=None):
+    """
+    Terminates the Verizon profile in the Ready state on a single EID. See _terminate_workflow.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    return _terminate_workflow(account_id, eid, VZW_PRODUCT, 'a Verizon', inventory, journal)
+
+
+@single_flight('terminate_att')
+def terminate_att_workflow(account_id, eid, inventory=None, journal=None):
+    """
+    Terminates the ATT profile in the Ready state on a single EID. See _terminate_workflow.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    return _terminate_workflow(account_id, eid, ATT_PRODUCT, 'an ATT', inventory, journal)
+
+
+TERMINATE_CARRIERS = {
+    'vzw': (VZW_PRODUCT, 'a Verizon'),
+    'att': (ATT_PRODUCT, 'an ATT')
+}
+
+
+def _check_terminate_error(item, error):
+    """
+    Builds the result of a termination check that raised an exception.
+
+    Returns:
+        tuple[list[str], str]: A single error message and no subscription ID.
+    """
+    return [error_message(item[1], error)], ''
+
+
+def _terminate_chunk(account_id, subscription_ids):
+    """
+    Terminates a chunk of subscriptions with a single provisioning request and waits for every
+    subscription in it to finish (see utils.polling.PROVISIONING_POLICY).
+
+    Args:
+        account_id (str): The ID of the account associated with the subscriptions.
+        subscription_ids (list[str]): The subscription IDs to terminate.
+
+    Returns:
+        tuple[str, dict[str, str], float]: The provisioning request ID, the final status keyed by
+                                           subscription ID and the elapsed time in seconds.
+
+    Raises:
+        RuntimeError: If the provisioning request was not accepted, so that the chunk fails at
+                      once (see _chunk_error) instead of polling a request that does not exist.
+    """
+    start_time = time.time()
+    provisioning_request_id = terminate_profiles(account_id, subscription_ids)
+    if not provisioning_request_id:
+        raise RuntimeError("The terminate request was not accepted.")
+    statuses = wait_for_provisioning_subscriptions(account_id, provisioning_request_id, subscription_ids)
+    end_time = time.time()
+    return provisioning_request_id, statuses, end_time - start_time
+
+
+def bulk_terminate_workflow(account_id, carrier, eids, chunk_size=BULK_CHUNK_SIZE, max_workers=BATCH_WORKERS,
+                            inventory=None, on_result=None):
+    """
+    Terminates the Ready carrier profile on many EIDs using multi-subscription provisioning requests.
+
+    Every EID is checked as in _terminate_workflow. The subscription IDs of the Ready profiles are
+    split into chunks of chunk_size, each chunk is terminated with one provisioning request, and
+    the completion status of every subscription in the response is tracked and mapped back to its
+    EID. Chunks are submitted and polled concurrently. An EID listed more than once, or already
+    being terminated by another batch, is terminated once and shares the result
+    (see utils.inflight).
+
+    Args:
+        account_id (str): The ID of the account associated with the EIDs.
+        carrier (str): 'vzw' or 'att'.
+        eids (list[str]): The EIDs of the devices.
+        chunk_size (int): The maximum number of subscriptions per provisioning request.
+        max_workers (int): The maximum number of checks or chunks processed at the same time.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        on_result (callable, optional): Called as on_result(index, result) with the index of an
+                                        EID and its result as soon as it is known, as for
+                                        bulk_download_workflow.
+
+    Returns:
+        list[tuple[list[str], list[dict]]]: The result messages and results.csv rows of each EID,
+                                            in input order. The result of an EID whose check or
+                                            chunk raised is an ErrorResult.
+    """
+    keys = [(f"terminate_{carrier}", account_id, eid) for eid in eids]
+
+    def run(indexes, done):
+        return _bulk_terminate(account_id, carrier, [eids[index] for index in indexes], chunk_size, max_workers,
+                               inventory, lambda position, result: done(indexes[position], result))
+    return inflight.run_many(keys, run, on_result)
+
+
+def _bulk_terminate(account_id, carrier, eids, chunk_size, max_workers, inventory, done):
+    """
+    Runs bulk_terminate_workflow for distinct EIDs that are not in flight elsewhere, calling
+    done(index, result) as the result of each EID is known.
+    """
+    product, carrier_name = TERMINATE_CARRIERS[carrier]
+    checks = []
+    results = []
+    eligible = []
+    for index, (item, check, raised) in enumerate(iter_batch_items(
+            [(account_id, eid, product, carrier_name, inventory) for eid in eids],
+            _check_terminate, _check_terminate_error, max_workers)):
+        messages, subscription_id = check
+        checks.append(check)
+        results.append(ErrorResult((messages, [])) if raised else (messages, []))
+        if messages:
+            done(index, results[index])
+        else:
+            eligible.append(index)
+
+    def run_chunk(indexes):
+        item = (account_id, [checks[index][1] for index in indexes])
+        try:
+            provisioning_request_id, statuses, elapsed_time = _terminate_chunk(*item)
+        except Exception as e:
+            provisioning_request_id, statuses, elapsed_time = _chunk_error(item, e)
+        for index in indexes:
+            eid = eids[index]
+            if provisioning_request_id is None:
+                results[index] = workflow_error((account_id, eid), statuses)
+            else:
+                status = statuses.get(checks[index][1], TIMED_OUT)
+                results[index] = _terminate_result(eid, provisioning_request_id, status, elapsed_time)
+            done(index, results[index])
+
+    chunks = [(eligible[start:start + chunk_size],) for start in range(0, len(eligible), chunk_size)]
+    run_batch(chunks, run_chunk, _publish_error, max_workers)
+    return results
+
+
+SWAP_CARRIERS = {
+    'vzw': ('att', VZW_ACTIVATION_PROFILE),
+    'att': ('vzw', ATT_ACTIVATION_PROFILE)
+}
+
+
+def _check_swap(account_id, eid, bs_iccid, from_carrier, to_carrier, inventory=None):
+    """
+    Checks whether a carrier swap may be started for a single EID.
+
+    Runs the checks of _terminate_workflow for the old carrier and of _download_workflow for
+    the new one against a single EidState. Terminating the old profile changes neither the
+    active ICCID nor the state of the new carrier profile, so the download needs no second
+    lookup.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        from_carrier (str): The carrier whose profile is terminated, 'vzw' or 'att'.
+        to_carrier (str): The carrier whose profile is downloaded, 'vzw' or 'att'.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+
+    Returns:
+        tuple[list[str], str]: The reasons the swap may not start (empty if it may) and the
+                               subscription ID of the Ready profile of the old carrier.
+    """
+    messages = []
+    from_product, from_name = TERMINATE_CARRIERS[from_carrier]
+    to_product, to_name = TERMINATE_CARRIERS[to_carrier]
+
+    state = _get_eid_state(account_id, eid, inventory)
+    old_profile = state.ready_profile(from_product)
+
+    if old_profile is None:
+        messages.append(f"EID {eid} does not have {from_name} profile in the Ready state present.")
+    if state.ready_profile(to_product) is not None:
+        messages.append(f"EID {eid} has {to_name} profile in the Ready state. "
+                        f"Terminate the profile and try again.")
+    if not compare_values(state.active_iccid, bs_iccid):
+        messages.append(f"EID {eid} does not match the provided Bootstrap ICCID.")
+
+    if messages:
+        return messages, ''
+    return messages, old_profile.subscription_id
+
+
+def _swap_rows(rows, operation, carrier):
+    """
+    Tags the results.csv rows of one step of a swap with its operation and carrier.
+
+    Returns:
+        list[dict]: The rows, each with 'operation' and 'carrier' set.
+    """
+    return [dict(row, operation=operation, carrier=carrier) for row in rows]
+
+
+def _swap_workflow(account_id, eid, imei, bs_iccid, to_carrier, inventory=None, journal=None):
+    """
+    Runs the carrier swap workflow for a single EID: terminate, confirm, download, confirm.
+
+    Checks the EID once (see _check_swap), terminates the Ready profile of the old carrier and
+    polls the provisioning request (see utils.polling.PROVISIONING_POLICY). Only once the
+    termination completed, downloads the profile of the new carrier and polls the switch
+    request (see utils.polling.SWITCH_POLICY). Run over many EIDs with utils.batch, every EID
+    moves through the stages on its own, so EIDs being terminated and EIDs being downloaded
+    overlap instead of waiting for a whole pass to finish.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        imei (str): The IMEI of the device.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        to_carrier (str): The carrier to move the device to, 'vzw' or 'att'.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID, and resumes the swap at the
+                                     step an earlier run stopped at (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows of each step
+                                      that ran for the EID.
+    """
+    from_carrier, activation_profile_id = SWAP_CARRIERS[to_carrier]
+    subscription_id = ''
+    if not _resuming(journal, eid, 'terminate'):
+        messages, subscription_id = _check_swap(account_id, eid, bs_iccid, from_carrier, to_carrier, inventory)
+        if messages:
+            return messages, []
+        if journal is not None:
+            journal.record(eid, 'checked')
+
+    provisioning_request_id, status, elapsed_time = _submit_terminate(account_id, eid, subscription_id, journal)
+    messages, rows = _terminate_result(eid, provisioning_request_id, status, elapsed_time)
+    rows = _swap_rows(rows, 'terminate', from_carrier)
+    if status.lower() != "completed":
+        messages.append(f"Swap for EID: {eid} stopped before the download.")
+        return messages, rows
+
+    product, subscription, carrier_name = DOWNLOAD_CARRIERS[activation_profile_id]
+    request_id, status, elapsed_time = _submit_download(
+        account_id, eid,
+        lambda: download_profiles(account_id, activation_profile_id, [subscription(eid, imei)]), journal)
+    download_messages, download_rows = _download_result(eid, request_id, status, elapsed_time)
+    return messages + download_messages, rows + _swap_rows(download_rows, 'download', to_carrier)
+
+
+@single_flight('swap_to_vzw')
+def swap_to_vzw_workflow(account_id, eid, imei, bs_iccid, inventory=None, journal=None):
+    """
+    Moves a single EID from its ATT profile to a Verizon profile. See _swap_workflow.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        imei (str): The IMEI of the device.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    return _swap_workflow(account_id, eid, imei, bs_iccid, 'vzw', inventory, journal)
+
+
+@single_flight('swap_to_att')
+def swap_to_att_workflow(account_id, eid, imei, bs_iccid, inventory=None, journal=None):
+    """
+    Moves a single EID from its Verizon profile to an ATT profile. See _swap_workflow.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        imei (str): The IMEI of the device. Not used by the ATT download request.
+        bs_iccid (str): The provided bootstrap ICCID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+        journal (Journal, optional): Records the stages of the EID (see utils.journal).
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    return _swap_workflow(account_id, eid, imei, bs_iccid, 'att', inventory, journal)
+
+
+@single_flight('query_eid')
+def query_eid_workflow(account_id, eid, inventory=None):
+    """
+    Retrieves the profile types and their state for a single EID.
+
+    Args:
+        account_id (str): The ID of the account associated with the EID.
+        eid (str): The EID of the device.
+        inventory (SubscriptionInventory, optional): Serves the subscriptions instead of the API.
+
+    Returns:
+        tuple[list[str], list[dict]]: The result messages and the results.csv rows for the EID.
+    """
+    messages = []
+    rows = []
+
+    for profile in _get_eid_state(account_id, eid, inventory).profiles:
+        messages.append(f"{eid} - {profile.service_type}: {profile.state}")
+        rows.append({
+            'eid': eid,
+            'profile': profile.service_type,
+            'state': profile.state
+        })
+
+    return messages, rows
+
+
+def error_message(eid, error):
+    """
+    Builds the result message of an EID whose workflow raised an exception.
+
+    Args:
+        eid (str): The EID.
+        error (Exception): The exception raised by the workflow.
+
+    Returns:
+        str: "API unavailable" if the circuit breaker of the API is open, so that the EID can be
+             retried once the API recovers, and the error otherwise.
+    """
+    if isinstance(error, ApiUnavailable):
+        return f"EID {eid} not processed, API unavailable: {error}"
+    return f"Processing EID {eid} failed: {error}"
+
+
+class ErrorResult(tuple):
+    """
+    The (messages, rows) result of an EID whose workflow, check or chunk raised an exception.
+
+    It unpacks like any other result, and lets the callers of the bulk workflows tell it apart
+    from a check that refused the EID, as iter_batch_items does for per-EID workflows.
+    """
+
+    __slots__ = ()
+
+
+def workflow_error(item, error):
+    """
+    Builds the result of a workflow that raised an exception, for use with utils.batch.run_batch.
+
+    Args:
+        item (tuple): The workflow arguments, starting with (account_id, eid, ...).
+        error (Exception): The exception raised by the workflow.
+
+    Returns:
+        ErrorResult: A single error message and no results.csv rows.
+    """
+    return ErrorResult(([error_message(item[1], error)], []))